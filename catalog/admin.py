@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Platform, TrackingParamSet, OfferNetwork, Offer, OfferLink, PersonalizedTag
+from .models import Platform, TrackingParamSet, OfferNetwork, Offer, OfferLink, PersonalizedTag, OfferImportJob
 
 # -------------------------
 # TrackingParamSet Inline (Compact)
@@ -135,3 +135,13 @@ class OfferAdmin(admin.ModelAdmin):
     list_filter = ('network',)
     inlines = [OfferLinkInline]
     list_display_links = ('name', 'network')
+
+
+@admin.register(OfferImportJob)
+class OfferImportJobAdmin(admin.ModelAdmin):
+    list_display = ('file_name', 'dry_run', 'status', 'rows_processed', 'links', 'updated', 'skipped', 'created_at')
+    list_filter = ('status', 'dry_run')
+    search_fields = ('file_name', 'last_error')
+    exclude = ('upload',)
+    readonly_fields = ('created_at', 'updated_at', 'locked_at')
+    ordering = ('-created_at',)
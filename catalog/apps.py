@@ -3,3 +3,6 @@ from django.apps import AppConfig
 class CatalogConfig(AppConfig):
     default_auto_field='django.db.models.BigAutoField'
     name='catalog'
+    def ready(self):
+        # Import signals to register them
+        from . import signals  # noqa
@@ -0,0 +1,91 @@
+# Offer browser data: filtering, counts and pagination all happen in SQL; offers are fetched per network on demand.
+from django.core.paginator import Paginator
+from django.db.models import Count, Q
+from django.urls import reverse
+
+from .models import Offer, OfferNetwork
+
+NETWORKS_PER_PAGE = 20
+OFFERS_PER_PAGE = 50
+
+
+def _offer_q(filters: dict, prefix="") -> Q:
+    """offer_index's offer/status filters, against Offer (prefix "") or OfferNetwork (prefix "offers__")."""
+    q = Q()
+    if filters["offer"]:
+        q &= Q(**{f"{prefix}name__icontains": filters["offer"]})
+    if filters["status"]:
+        q &= Q(**{f"{prefix}links__is_active": filters["status"] == "active"})
+    return q
+
+
+def _page_json(page, results):
+    return {
+        "results": results,
+        "page": page.number,
+        "num_pages": page.paginator.num_pages,
+        "count": page.paginator.count,
+        "has_next": page.has_next(),
+        "has_previous": page.has_previous(),
+    }
+
+
+def network_page(filters: dict, page_number) -> dict:
+    """Networks that have at least one matching offer, with matching-offer and active-link counts."""
+    matching = _offer_q(filters, "offers__")
+    networks = OfferNetwork.objects.annotate(
+        offer_count=Count("offers", filter=matching, distinct=True),
+        active_links=Count("offers__links", filter=matching & Q(offers__links__is_active=True), distinct=True),
+    ).filter(offer_count__gt=0)
+    if filters["network"]:
+        networks = networks.filter(pk=filters["network"])
+
+    page = Paginator(
+        networks.order_by("name").values("pk", "name", "offer_count", "active_links"),
+        NETWORKS_PER_PAGE,
+    ).get_page(page_number)
+    return _page_json(page, [
+        {
+            "id": n["pk"],
+            "name": n["name"],
+            "offer_count": n["offer_count"],
+            "active_links": n["active_links"],
+            "offers_url": reverse("catalog:offer_browser_offers", args=[n["pk"]]),
+            "edit_url": reverse("catalog:offer_network_edit", args=[n["pk"]]),
+            "delete_url": reverse("catalog:offer_network_delete", args=[n["pk"]]),
+        }
+        for n in page.object_list
+    ])
+
+
+def _link_json(row):
+    if row["links__pk"] is None:
+        return None
+    return {
+        "id": row["links__pk"],
+        "url": row["links__url"],
+        "is_active": row["links__is_active"],
+        "updated_at": row["links__updated_at"],
+        "edit_url": reverse("catalog:offer_link_edit", args=[row["links__pk"]]),
+        "delete_url": reverse("catalog:offer_link_delete", args=[row["links__pk"]]),
+    }
+
+
+def offer_page(network_id, filters: dict, page_number) -> dict:
+    """One network's matching offers with their link (OfferLink is one-to-one, so one row per offer)."""
+    offers = (
+        Offer.objects.filter(_offer_q(filters), network_id=network_id)
+        .order_by("name", "pk")
+        .values("pk", "name", "links__pk", "links__url", "links__is_active", "links__updated_at")
+    )
+    page = Paginator(offers, OFFERS_PER_PAGE).get_page(page_number)
+    return _page_json(page, [
+        {
+            "id": row["pk"],
+            "name": row["name"],
+            "edit_url": reverse("catalog:offer_edit", args=[row["pk"]]),
+            "delete_url": reverse("catalog:offer_delete", args=[row["pk"]]),
+            "link": _link_json(row),
+        }
+        for row in page.object_list
+    ])
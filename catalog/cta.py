@@ -0,0 +1,66 @@
+# CTA URLs (offer URL + tracking params), materialized on first use: one ResolvedCTA row per
+# (OfferLink, TrackingParamSet) pair that has actually been resolved, not the whole cross product.
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from emails.utils import append_query_params
+
+from .models import ResolvedCTA
+
+BATCH_SIZE = 2000
+
+
+def with_cta(links, tracking):
+    """Annotate `links` with `cta_url`: the stored URL under `tracking`, None until first resolved."""
+    if tracking is None:
+        return links
+    stored = ResolvedCTA.objects.filter(offer_link=OuterRef("pk"), tracking=tracking).values("url")[:1]
+    return links.annotate(cta_url=Subquery(stored))
+
+
+def resolve_cta(offer_link, tracking):
+    """
+    Final CTA URL for an active link under `tracking`. Uses the `with_cta` annotation when the
+    link was loaded with it, otherwise one indexed read; a miss is computed and stored.
+    """
+    if hasattr(offer_link, "cta_url"):
+        url = offer_link.cta_url
+    else:
+        url = ResolvedCTA.objects.filter(offer_link=offer_link, tracking=tracking).values_list("url", flat=True).first()
+    if url is None:
+        url = append_query_params(offer_link.url, tracking.params or {})
+        ResolvedCTA.objects.bulk_create(
+            [ResolvedCTA(offer_link_id=offer_link.pk, tracking_id=tracking.pk, url=url)], ignore_conflicts=True
+        )
+    return url
+
+
+def invalidate_offer_links(link_ids):
+    """Drop the stored rows of these links (url or is_active changed); they are recomputed on next use."""
+    return ResolvedCTA.objects.filter(offer_link_id__in=list(link_ids)).delete()[0]
+
+
+def invalidate_tracking_sets(tracking_ids):
+    """Drop the stored rows of these tracking sets (params, platform or is_active changed)."""
+    return ResolvedCTA.objects.filter(tracking_id__in=list(tracking_ids)).delete()[0]
+
+
+@transaction.atomic
+def rebuild_all():
+    """
+    Recompute every stored row from the current catalog in bulk, e.g. after writes that bypassed
+    the signals. Rows whose link or tracking set is no longer active are dropped. Returns rows updated.
+    """
+    ResolvedCTA.objects.exclude(offer_link__is_active=True, tracking__is_active=True).delete()
+    rows = ResolvedCTA.objects.values_list("pk", "url", "offer_link__url", "tracking__params")
+    batch, written = [], 0
+    for pk, url, link_url, params in rows.iterator(chunk_size=BATCH_SIZE):
+        fresh = append_query_params(link_url, params or {})
+        if fresh != url:
+            batch.append(ResolvedCTA(pk=pk, url=fresh))
+        if len(batch) >= BATCH_SIZE:
+            written += ResolvedCTA.objects.bulk_update(batch, ["url"])
+            batch = []
+    if batch:
+        written += ResolvedCTA.objects.bulk_update(batch, ["url"])
+    return written
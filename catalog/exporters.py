@@ -0,0 +1,74 @@
+# Streaming catalog export in the same network/offer/url/is_active layout the importer reads.
+import csv
+import io
+
+from .importers import COLUMNS
+from .models import OfferLink
+
+CHUNK_ROWS = 5000
+FORMATS = ("csv", "xlsx")
+# Largest XLSX served from a request (OFFER_XLSX_EXPORT_MAX_ROWS overrides); bigger ones go through the command
+XLSX_MAX_ROWS = 100_000
+
+
+def offer_filters(params) -> dict:
+    """The offer_index filter bar (network id, offer name contains, link status) from a QueryDict."""
+    network = params.get("network") or ""
+    return {
+        "network": network if network.isdigit() else "",
+        "offer": (params.get("offer") or "").strip(),
+        "status": params.get("status") if params.get("status") in ("active", "inactive") else "",
+    }
+
+
+def _links(filters: dict):
+    links = OfferLink.objects.all()
+    if filters["network"]:
+        links = links.filter(offer__network_id=filters["network"])
+    if filters["offer"]:
+        links = links.filter(offer__name__icontains=filters["offer"])
+    if filters["status"]:
+        links = links.filter(is_active=filters["status"] == "active")
+    return links
+
+
+def catalog_count(filters: dict) -> int:
+    return _links(filters).count()
+
+
+def catalog_rows(filters: dict, chunk_size=CHUNK_ROWS):
+    """(network, offer, url, is_active) tuples, read through a server-side cursor; no model instances."""
+    return (
+        _links(filters).order_by("offer__network__name", "offer__name")
+        .values_list("offer__network__name", "offer__name", "url", "is_active")
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def stream_csv(rows, batch=1000):
+    """Yield the CSV text in blocks of `batch` rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for i, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if i % batch == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def write_xlsx(rows, fh):
+    """
+    Write the rows as a workbook into `fh`. openpyxl's write_only mode spools the sheet to a
+    temp file as it goes, so memory stays flat; the zip is only assembled on save.
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("offers")
+    ws.append(COLUMNS)
+    for row in rows:
+        ws.append(row)
+    wb.save(fh)
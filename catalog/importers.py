@@ -0,0 +1,240 @@
+# Streaming offer-link importer: walks a .xlsx/.csv upload row by row and writes it in fixed-size chunks.
+import csv
+import io
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Q
+
+from .cta import invalidate_offer_links
+from .models import Offer, OfferLink, OfferNetwork
+from .search import bump_catalog_generation
+
+CHUNK_ROWS = 2000
+COLUMNS = ("network", "offer", "url", "is_active")
+FALSE_VALUES = {"0", "false", "no", "n", "off"}
+MAX_ERRORS = 100
+DIFF_SAMPLES = 20
+
+
+@dataclass
+class ImportStats:
+    rows: int = 0
+    networks: int = 0
+    offers: int = 0
+    links: int = 0
+    updated: int = 0
+    skipped: int = 0
+    errors: list = field(default_factory=list)
+
+    def skip(self, row, error):
+        self.skipped += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"row": row, "error": error})
+
+    def __str__(self):
+        return (f"{self.networks} networks, {self.offers} offers, {self.links} new links, "
+                f"{self.updated} updated, {self.skipped} skipped")
+
+
+def iter_offer_rows(upload):
+    """Yield one {column: value} dict per data row; only COLUMNS are kept, headers are case-insensitive."""
+    name = (upload.name or "").lower()
+    if name.endswith(".xlsx"):
+        from openpyxl import load_workbook
+
+        wb = load_workbook(upload, read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            header = [str(h).strip().lower() if h is not None else "" for h in next(rows, [])]
+            for values in rows:
+                yield {h: v for h, v in zip(header, values) if h in COLUMNS}
+        finally:
+            wb.close()
+    elif name.endswith(".csv"):
+        text = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+        reader = csv.reader(text)
+        header = [h.strip().lower() for h in next(reader, [])]
+        for values in reader:
+            yield {h: v for h, v in zip(header, values) if h in COLUMNS}
+    else:
+        raise ValueError("Upload a .xlsx or .csv file.")
+
+
+def _text(value):
+    return "" if value is None else str(value).strip()
+
+
+def _flag(value):
+    # Blank means active, like a missing column
+    if value is None or value == "":
+        return True
+    if isinstance(value, str):
+        return value.strip().lower() not in FALSE_VALUES
+    return bool(value)
+
+
+def _clean(rows, stats):
+    # Row numbers as the spreadsheet shows them: the header is row 1
+    for number, row in enumerate(rows, start=2):
+        stats.rows += 1
+        network, offer, url = _text(row.get("network")), _text(row.get("offer")), _text(row.get("url"))
+        if not (network and offer and url):
+            stats.skip(number, "network, offer and url are required")
+            continue
+        yield number, network, offer, url, _flag(row.get("is_active"))
+
+
+def _chunks(rows, size):
+    it = iter(rows)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+def _networks(names, stats):
+    found = dict(OfferNetwork.objects.filter(name__in=names).values_list("name", "pk"))
+    missing = [OfferNetwork(name=n) for n in names if n not in found]
+    if missing:
+        # Upserting (not ignoring) conflicts returns a pk even for rows a concurrent import just created
+        OfferNetwork.objects.bulk_create(missing, update_conflicts=True, unique_fields=["name"], update_fields=["name"])
+        stats.networks += len(missing)
+        found.update((n.name, n.pk) for n in missing)
+    return found
+
+
+def _offers(keys, stats):
+    """{(network_id, name): offer_id} for exactly the keys in this chunk."""
+    network_ids, names = {k[0] for k in keys}, {k[1] for k in keys}
+    rows = Offer.objects.filter(network_id__in=network_ids, name__in=names).values_list("network_id", "name", "pk")
+    found = {(n, name): pk for n, name, pk in rows if (n, name) in keys}
+    missing = [Offer(network_id=n, name=name) for n, name in keys if (n, name) not in found]
+    if missing:
+        Offer.objects.bulk_create(
+            missing, update_conflicts=True, unique_fields=["network", "name"], update_fields=["name"]
+        )
+        stats.offers += len(missing)
+        found.update(((o.network_id, o.name), o.pk) for o in missing)
+    return found
+
+
+def _import_chunk(chunk, user, stats):
+    """A fixed number of statements per chunk, whatever its size: read, then one upsert per entity."""
+    # Last row wins when a workbook lists the same offer twice
+    rows = {(network, offer): (url, active, number) for number, network, offer, url, active in chunk}
+    network_ids = _networks({network for network, _ in rows}, stats)
+    wanted = {(network_ids[network], offer): value for (network, offer), value in rows.items()}
+    offer_ids = _offers(set(wanted), stats)
+    by_offer = {offer_ids[key]: value for key, value in wanted.items()}
+
+    # Existing links of these offers, plus links of other offers already using one of the URLs
+    existing, url_owner = {}, {}
+    urls = {url for url, _, _ in by_offer.values()}
+    for pk, offer_id, url, active in OfferLink.objects.filter(
+        Q(offer_id__in=by_offer) | Q(url__in=urls)
+    ).values_list("pk", "offer_id", "url", "is_active"):
+        existing[offer_id] = (url, active)
+        url_owner[url] = offer_id
+
+    upserts = []
+    for offer_id, (url, active, number) in by_offer.items():
+        if url_owner.setdefault(url, offer_id) != offer_id:
+            stats.skip(number, f"{url} already belongs to another offer")
+            continue
+        current = existing.get(offer_id)
+        if current == (url, active):
+            continue
+        if current:
+            stats.updated += 1
+        else:
+            stats.links += 1
+        upserts.append(OfferLink(offer_id=offer_id, url=url, is_active=active, created_by=user))
+    if not upserts:
+        return
+
+    OfferLink.objects.bulk_create(
+        upserts, update_conflicts=True, unique_fields=["offer"], update_fields=["url", "is_active", "updated_at"]
+    )
+    # bulk writes skip post_save, so drop stored CTA URLs of every touched link here
+    invalidate_offer_links([link.pk for link in upserts])
+
+
+def import_offer_links(rows, user=None, chunk_size=CHUNK_ROWS, on_chunk=None):
+    """
+    Upsert network/offer/link rows in chunks of `chunk_size`. Each chunk looks up only its own
+    keys and commits on its own, so memory stays flat however long the workbook is.
+    `on_chunk(stats)` is called after every commit, e.g. to report progress.
+    """
+    stats = ImportStats()
+    try:
+        for chunk in _chunks(_clean(rows, stats), chunk_size):
+            with transaction.atomic():
+                _import_chunk(chunk, user, stats)
+            if on_chunk:
+                on_chunk(stats)
+    finally:
+        # Bulk writes send no signals. Once per import, also after a failure (earlier chunks are
+        # committed), so processes rebuild their search index once rather than after every chunk.
+        bump_catalog_generation()
+    return stats
+
+
+# ---------- dry run ----------
+def diff_offer_rows(rows):
+    """
+    What import_offer_links(rows) would do, without writing: the upload is merged against the
+    whole catalog in pandas. Returns (stats, diff) where diff holds counts and a few sample rows.
+    """
+    import pandas as pd
+
+    stats = ImportStats()
+    upload = pd.DataFrame.from_records(
+        list(_clean(rows, stats)), columns=["row", "network", "offer", "url", "is_active"]
+    ).drop_duplicates(["network", "offer"], keep="last")
+    catalog = pd.DataFrame.from_records(
+        list(Offer.objects.values_list("network__name", "name", "links__url", "links__is_active")),
+        columns=["network", "offer", "url", "is_active"],
+    )
+    networks = set(OfferNetwork.objects.values_list("name", flat=True))
+
+    merged = upload.merge(catalog, on=["network", "offer"], how="left", suffixes=("", "_current"), indicator=True)
+    merged["new_offer"] = merged["_merge"] == "left_only"
+    has_link = merged["url_current"].notna()
+
+    # url is unique: it may not belong to another offer, in the catalog or earlier in the upload
+    owners = catalog.dropna(subset=["url"])[["url", "network", "offer"]]
+    claimed = merged.merge(owners, on="url", how="left", suffixes=("", "_owner"))
+    taken = claimed["network_owner"].notna() & (
+        (claimed["network_owner"] != claimed["network"]) | (claimed["offer_owner"] != claimed["offer"])
+    )
+    conflict = taken.to_numpy() | merged.duplicated("url", keep="first").to_numpy()
+
+    changed = (merged["url"] != merged["url_current"]) | (merged["is_active"] != merged["is_active_current"])
+    create = ~conflict & ~has_link
+    update = ~conflict & has_link & changed
+
+    for number, url in merged.loc[conflict, ["row", "url"]].itertuples(index=False):
+        stats.skip(int(number), f"{url} already belongs to another offer")
+    # Networks and offers are created even when the row's link is then skipped, as in the real import
+    stats.networks = len(set(merged["network"]) - networks)
+    stats.offers = int(merged["new_offer"].sum())
+    stats.links = int(create.sum())
+    stats.updated = int(update.sum())
+
+    def sample(mask, columns):
+        frame = merged.loc[mask, columns].head(DIFF_SAMPLES)
+        return frame.astype(object).where(frame.notna(), None).to_dict("records")
+
+    diff = {
+        "networks": stats.networks,
+        "offers": stats.offers,
+        "create": stats.links,
+        "update": stats.updated,
+        "unchanged": int((~conflict & has_link & ~changed).sum()),
+        "skipped": stats.skipped,
+        "samples": {
+            "create": sample(create, ["row", "network", "offer", "url", "is_active"]),
+            "update": sample(update, ["row", "network", "offer", "url_current", "url", "is_active_current", "is_active"]),
+        },
+    }
+    return stats, diff
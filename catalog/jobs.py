@@ -0,0 +1,122 @@
+import io
+import logging
+from datetime import timedelta
+
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .importers import diff_offer_rows, import_offer_links, iter_offer_rows
+from .models import OfferImportJob
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_SUFFIXES = (".xlsx", ".csv")
+# A "running" import that has not reported progress for this long is treated as dead and handed out
+# again (upserts make a rerun safe); locked_at is refreshed after every chunk as a heartbeat
+STALE_LOCK_SECONDS = 1800
+PROGRESS_FIELDS = ["rows_processed", "networks", "offers", "links", "updated", "skipped", "errors"]
+# A finished dry run that is not applied within this long drops its upload and can no longer be applied
+DRY_RUN_TTL = timedelta(days=7)
+
+
+def enqueue_import(upload, user, dry_run=False) -> OfferImportJob:
+    """Store the uploaded file on a pending job; the request returns without parsing it."""
+    if not (upload.name or "").lower().endswith(UPLOAD_SUFFIXES):
+        raise ValueError("Upload a .xlsx or .csv file.")
+    return OfferImportJob.objects.create(
+        created_by=user, file_name=upload.name, upload=upload.read(), dry_run=dry_run
+    )
+
+
+def apply_dry_run(job: OfferImportJob, user) -> OfferImportJob | None:
+    """
+    Queue the real import of a reviewed dry run's file, once. The dry run moves from done to
+    applied first, so a repeated submit gets the already queued import back instead of a second one.
+    Returns None if the dry run is not finished.
+    """
+    with transaction.atomic():
+        moved = OfferImportJob.objects.filter(
+            pk=job.pk, dry_run=True, status=OfferImportJob.STATUS_DONE
+        ).update(status=OfferImportJob.STATUS_APPLIED)
+        if not moved:
+            return OfferImportJob.objects.filter(applied_from=job.pk).first()
+        real = OfferImportJob.objects.create(created_by=user, file_name=job.file_name, upload=job.upload)
+        # The real job carries the file from here on
+        OfferImportJob.objects.filter(pk=job.pk).update(applied_as=real, upload=b"")
+    job.upload = b""
+    return real
+
+
+def expire_dry_runs() -> int:
+    """Drop the uploads of dry runs that finished more than DRY_RUN_TTL ago without being applied."""
+    return OfferImportJob.objects.filter(
+        dry_run=True,
+        status__in=[OfferImportJob.STATUS_DONE, OfferImportJob.STATUS_FAILED],
+        updated_at__lt=timezone.now() - DRY_RUN_TTL,
+    ).update(status=OfferImportJob.STATUS_EXPIRED, upload=b"", updated_at=timezone.now())
+
+
+def claim_import_jobs(limit: int = 1) -> list[OfferImportJob]:
+    """Atomically claim up to ``limit`` runnable jobs (SELECT ... FOR UPDATE SKIP LOCKED)."""
+    now = timezone.now()
+    runnable = Q(status=OfferImportJob.STATUS_PENDING) | Q(
+        status=OfferImportJob.STATUS_RUNNING,
+        locked_at__lt=now - timedelta(seconds=STALE_LOCK_SECONDS),
+    )
+    with transaction.atomic():
+        jobs = list(
+            OfferImportJob.objects.select_for_update(skip_locked=True)
+            .filter(runnable)
+            .order_by("created_at")[:limit]
+        )
+        if jobs:
+            OfferImportJob.objects.filter(pk__in=[j.pk for j in jobs]).update(
+                status=OfferImportJob.STATUS_RUNNING, locked_at=now
+            )
+            for job in jobs:
+                job.status = OfferImportJob.STATUS_RUNNING
+                job.locked_at = now
+    return jobs
+
+
+def _record(job: OfferImportJob, stats) -> None:
+    job.rows_processed = stats.rows
+    job.networks, job.offers, job.links = stats.networks, stats.offers, stats.links
+    job.updated, job.skipped, job.errors = stats.updated, stats.skipped, stats.errors
+
+
+def _report_progress(job: OfferImportJob):
+    def on_chunk(stats):
+        _record(job, stats)
+        job.locked_at = timezone.now()   # heartbeat, so a long import is never taken for a dead one
+        job.save(update_fields=[*PROGRESS_FIELDS, "locked_at", "updated_at"])
+    return on_chunk
+
+
+def run_import_job(job: OfferImportJob) -> bool:
+    """Process one claimed job. Returns True on success."""
+    upload = File(io.BytesIO(bytes(job.upload)), name=job.file_name)
+    try:
+        rows = iter_offer_rows(upload)
+        if job.dry_run:
+            stats, job.diff = diff_offer_rows(rows)
+            _record(job, stats)
+        else:
+            _record(job, import_offer_links(rows, user=job.created_by, on_chunk=_report_progress(job)))
+            job.upload = b""
+    except Exception as e:
+        # Chunks committed before the failure stay; the progress fields say how far it got
+        logger.exception("Offer import job %s failed: %s", job.pk, e)
+        job.status = OfferImportJob.STATUS_FAILED
+        job.locked_at = None
+        job.last_error = str(e)[:2000]
+        job.save(update_fields=["status", "locked_at", "last_error", "updated_at"])
+        return False
+
+    job.status = OfferImportJob.STATUS_DONE
+    job.locked_at = None
+    job.last_error = ""
+    job.save(update_fields=[*PROGRESS_FIELDS, "diff", "upload", "status", "locked_at", "last_error", "updated_at"])
+    return True
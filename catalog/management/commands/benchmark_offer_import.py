@@ -0,0 +1,119 @@
+import os
+import tempfile
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog.cta import invalidate_offer_links
+from catalog.importers import import_offer_links, iter_offer_rows
+from catalog.models import Offer, OfferLink, OfferNetwork
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _legacy_import(path, user):
+    # The pre-streaming upload_offer_links body: whole DataFrame, iterrows, every row preloaded
+    import pandas as pd
+
+    df = pd.read_excel(path).dropna(subset=["network", "offer", "url"])
+    networks = {n.name: n for n in OfferNetwork.objects.all()}
+    offers = {(o.network.name, o.name): o for o in Offer.objects.select_related("network")}
+    links = {(l.offer.network.name, l.offer.name): l for l in OfferLink.objects.select_related("offer__network")}
+    new_networks, new_offers, new_links = [], [], []
+    for _, row in df.iterrows():
+        network_name, offer_name, url = str(row["network"]).strip(), str(row["offer"]).strip(), str(row["url"]).strip()
+        is_active = bool(row.get("is_active", True))
+        network = networks.get(network_name)
+        if not network:
+            network = networks[network_name] = OfferNetwork(name=network_name)
+            new_networks.append(network)
+        offer = offers.get((network_name, offer_name))
+        if not offer:
+            offer = offers[(network_name, offer_name)] = Offer(network=network, name=offer_name)
+            new_offers.append(offer)
+        link = links.get((network_name, offer_name))
+        if link:
+            if link.url != url or link.is_active != is_active:
+                link.url, link.is_active = url, is_active
+                link.save(update_fields=["url", "is_active"])
+        else:
+            link = links[(network_name, offer_name)] = OfferLink(offer=offer, url=url, is_active=is_active, created_by=user)
+            new_links.append(link)
+    OfferNetwork.objects.bulk_create(new_networks, ignore_conflicts=True)
+    for n in OfferNetwork.objects.filter(name__in=[n.name for n in new_networks]):
+        networks[n.name] = n
+    for o in new_offers:
+        o.network = networks[o.network.name]
+    Offer.objects.bulk_create(new_offers, ignore_conflicts=True)
+    for o in Offer.objects.select_related("network").filter(name__in=[o.name for o in new_offers]):
+        offers[(o.network.name, o.name)] = o
+    for l in new_links:
+        l.offer = offers[(l.offer.network.name, l.offer.name)]
+    OfferLink.objects.bulk_create(new_links, ignore_conflicts=True)
+    invalidate_offer_links(OfferLink.objects.filter(url__in=[l.url for l in new_links]).values_list("pk", flat=True))
+
+
+def _streaming_import(path, user):
+    with open(path, "rb") as fh:
+        import_offer_links(iter_offer_rows(File(fh, name=os.path.basename(path))), user=user)
+
+
+class Command(BaseCommand):
+    help = "Benchmark the offer workbook import: pandas iterrows (old) vs. the streaming chunked importer."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=50_000, help="Rows in the synthetic workbook")
+        parser.add_argument("--networks", type=int, default=20, help="Distinct networks in the workbook")
+        parser.add_argument("--skip-legacy", action="store_true", help="Only measure the streaming importer")
+
+    def handle(self, *args, **opts):
+        from openpyxl import Workbook
+
+        fd, path = tempfile.mkstemp(suffix=".xlsx")
+        os.close(fd)
+        try:
+            started = time.monotonic()
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet()
+            ws.append(["network", "offer", "url", "is_active"])
+            for i in range(opts["rows"]):
+                ws.append([f"Bench Network {i % opts['networks']}", f"Bench Offer {i}",
+                           f"https://bench.example.com/o/{i}", i % 10 != 0])
+            wb.save(path)
+            self.stdout.write(f"Wrote {opts['rows']} rows ({os.path.getsize(path) / 1e6:.1f} MB) "
+                              f"in {time.monotonic() - started:.1f}s")
+
+            user, _ = get_user_model().objects.get_or_create(username="import-benchmark")
+            runs = [("streaming", _streaming_import)]
+            if not opts["skip_legacy"]:
+                runs.insert(0, ("pandas iterrows", _legacy_import))
+            for label, run in runs:
+                self._measure(label, run, path, user)
+        finally:
+            os.unlink(path)
+
+    def _measure(self, label, run, path, user):
+        # Timed and traced in separate passes (tracemalloc slows everything down);
+        # each pass starts from the same catalog and is rolled back afterwards
+        elapsed = self._rolled_back(run, path, user)
+        tracemalloc.start()
+        self._rolled_back(run, path, user)
+        _current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stdout.write(f"  {label:<16} {elapsed:7.2f} s   peak {peak / 1e6:8.1f} MB")
+
+    def _rolled_back(self, run, path, user):
+        started = time.monotonic()
+        try:
+            with transaction.atomic():
+                run(path, user)
+                elapsed = time.monotonic() - started
+                raise _Rollback
+        except _Rollback:
+            return elapsed
@@ -0,0 +1,71 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog.models import Offer, OfferLink, OfferNetwork
+from catalog.search import build_offer_index
+
+WORDS = (
+    "casino bonus crypto vpn dating keto insurance loan solar travel fitness gaming credit "
+    "trial sweepstakes nutra survey mobile finance health beauty pet home auto"
+).split()
+TERMS = ["c", "ca", "cas", "casino", "keto tr", "vpn", "loan mob", "insur", "solar h", "zzz"]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark the offer autocomplete: icontains join per keystroke vs. the in-memory offer index."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--offers", type=int, default=100_000, help="Synthetic offers (one link each)")
+        parser.add_argument("--networks", type=int, default=200)
+        parser.add_argument("--repeat", type=int, default=20, help="Runs per search term")
+
+    def handle(self, *args, **opts):
+        try:
+            with transaction.atomic():
+                self._run(opts)
+                raise _Rollback
+        except _Rollback:
+            self.stdout.write("Synthetic rows rolled back.")
+
+    def _run(self, opts):
+        rng = random.Random(42)
+        started = time.monotonic()
+        networks = OfferNetwork.objects.bulk_create(
+            [OfferNetwork(name=f"Bench {rng.choice(WORDS).title()} Network {i}") for i in range(opts["networks"])]
+        )
+        offers = Offer.objects.bulk_create(
+            [Offer(network=networks[i % len(networks)], name=" ".join(rng.sample(WORDS, 3)).title() + f" {i}")
+             for i in range(opts["offers"])],
+            batch_size=5000,
+        )
+        OfferLink.objects.bulk_create(
+            [OfferLink(offer=o, url=f"https://bench.example.com/offer/{o.pk}") for o in offers], batch_size=5000
+        )
+        self.stdout.write(f"Inserted {opts['offers']} offers in {time.monotonic() - started:.1f}s")
+
+        started = time.monotonic()
+        index = build_offer_index()
+        self.stdout.write(f"Built index over {len(index)} links in {time.monotonic() - started:.2f}s")
+
+        def icontains(term):
+            # The old get_queryset plus one page of select2 labels (OfferLink.__str__)
+            qs = OfferLink.objects.filter(is_active=True, offer__name__icontains=term).select_related("offer__network")
+            return [str(link) for link in qs[:25]]
+
+        for label, run in [("icontains join", icontains), ("in-memory index", lambda t: index.search(t, limit=25))]:
+            timings = []
+            for term in TERMS:
+                for _ in range(opts["repeat"]):
+                    t0 = time.perf_counter()
+                    run(term)
+                    timings.append((time.perf_counter() - t0) * 1000)
+            p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+            self.stdout.write(f"  {label:<16} p50 {statistics.median(timings):8.3f} ms   p95 {p95:8.3f} ms")
@@ -0,0 +1,36 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from catalog.exporters import FORMATS, catalog_rows, stream_csv, write_xlsx
+
+
+class Command(BaseCommand):
+    help = "Export OfferNetwork/Offer/OfferLink rows as CSV or XLSX, in the layout the offer upload accepts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=FORMATS, default="csv")
+        parser.add_argument("--output", "-o", help="File to write (CSV goes to stdout when omitted)")
+        parser.add_argument("--network", default="", help="OfferNetwork id")
+        parser.add_argument("--offer", default="", help="Only offers whose name contains this")
+        parser.add_argument("--status", choices=["active", "inactive"], default="")
+
+    def handle(self, *args, **opts):
+        fmt, output = opts["format"], opts["output"]
+        if fmt == "xlsx" and not output:
+            raise CommandError("--output is required for xlsx")
+        if opts["network"] and not opts["network"].isdigit():
+            raise CommandError("--network takes an OfferNetwork id")
+        rows = catalog_rows({"network": opts["network"], "offer": opts["offer"], "status": opts["status"]})
+
+        started = time.monotonic()
+        if fmt == "xlsx":
+            with open(output, "wb") as fh:
+                write_xlsx(rows, fh)
+        elif output:
+            with open(output, "w", encoding="utf-8", newline="") as fh:
+                fh.writelines(stream_csv(rows))
+        else:
+            sys.stdout.writelines(stream_csv(rows))
+            return
+        self.stdout.write(self.style.SUCCESS(f"Wrote {output} in {time.monotonic() - started:.1f}s"))
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from catalog.jobs import claim_import_jobs, expire_dry_runs, run_import_job
+
+EXPIRE_EVERY = 3600   # seconds between sweeps for stale dry-run uploads
+
+
+class Command(BaseCommand):
+    help = "Claim queued OfferImportJob rows and run them (dry-run diffs and real imports)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sleep", type=float, default=2.0, help="Seconds to wait when the queue is empty")
+        parser.add_argument("--once", action="store_true", help="Drain the queue and exit")
+
+    def handle(self, *args, **opts):
+        sleep, once = opts["sleep"], opts["once"]
+        done = failed = 0
+        swept = None
+        self.stdout.write("Offer import worker started.")
+        try:
+            while True:
+                close_old_connections()
+                if swept is None or time.monotonic() - swept >= EXPIRE_EVERY:
+                    expired = expire_dry_runs()
+                    if expired:
+                        self.stdout.write(f"Expired {expired} unapplied dry run(s)")
+                    swept = time.monotonic()
+                jobs = claim_import_jobs(limit=1)   # imports are long; one at a time per worker
+                if not jobs:
+                    if once:
+                        break
+                    time.sleep(sleep)
+                    continue
+                job = jobs[0]
+                if run_import_job(job):
+                    done += 1
+                    self.stdout.write(f"Job {job.pk} ({job.file_name}): {job.rows_processed} rows")
+                else:
+                    failed += 1
+                    self.stderr.write(f"Job {job.pk} ({job.file_name}) failed: {job.last_error}")
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Offer import worker stopped: {done} done, {failed} failed"))
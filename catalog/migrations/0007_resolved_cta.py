@@ -0,0 +1,54 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_personalizedtag_email_tag_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResolvedCTA',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.TextField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='offerlink',
+            index=models.Index(fields=['is_active'], name='catalog_off_is_acti_563260_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trackingparamset',
+            index=models.Index(fields=['platform', 'is_active'], name='catalog_tra_platfor_7a15f0_idx'),
+        ),
+        migrations.AddField(
+            model_name='resolvedcta',
+            name='offer_link',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resolved_ctas', to='catalog.offerlink'),
+        ),
+        migrations.AddField(
+            model_name='resolvedcta',
+            name='platform',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.platform'),
+        ),
+        migrations.AddField(
+            model_name='resolvedcta',
+            name='tracking',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resolved_ctas', to='catalog.trackingparamset'),
+        ),
+        migrations.AddIndex(
+            model_name='resolvedcta',
+            index=models.Index(fields=['platform', 'offer_link', 'tracking'], name='catalog_res_platfor_d00488_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='resolvedcta',
+            constraint=models.UniqueConstraint(fields=('offer_link', 'tracking'), name='unique_resolved_cta'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:04
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_offer_import_job'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='resolvedcta',
+            name='catalog_res_platfor_d00488_idx',
+        ),
+        migrations.RemoveField(
+            model_name='resolvedcta',
+            name='platform',
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0009_resolvedcta_drop_platform'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='offerimportjob',
+            name='applied_as',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='applied_from', to='catalog.offerimportjob'),
+        ),
+        migrations.AlterField(
+            model_name='offerimportjob',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed'), ('applied', 'Applied')], default='pending', max_length=10),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0010_offer_import_job_applied'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='offerimportjob',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed'), ('applied', 'Applied'), ('expired', 'Expired')], default='pending', max_length=10),
+        ),
+    ]
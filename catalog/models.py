@@ -47,6 +47,11 @@ class TrackingParamSet(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['platform', 'is_active']),
+        ]
+
     def __str__(self):
         return f"Params for {self.platform.name if self.platform else 'No Platform'}"
 
@@ -83,6 +88,27 @@ class OfferLink(models.Model):
         indexes = [
             models.Index(fields=['is_active']),
         ]
+
+class ResolvedCTA(models.Model):
+    """
+    Final CTA URL (offer URL + tracking params) for an OfferLink/TrackingParamSet pair, stored the
+    first time template_use resolves it. catalog.signals drops rows when either side changes;
+    `manage.py rebuild_cta_urls` recomputes the stored rows in bulk.
+    """
+    offer_link = models.ForeignKey(OfferLink, on_delete=models.CASCADE, related_name='resolved_ctas')
+    tracking = models.ForeignKey(TrackingParamSet, on_delete=models.CASCADE, related_name='resolved_ctas')
+    url = models.TextField()
+
+    class Meta:
+        # Also the index template_use reads through
+        constraints = [
+            models.UniqueConstraint(fields=['offer_link', 'tracking'], name='unique_resolved_cta')
+        ]
+
+    def __str__(self):
+        return self.url[:80]
+
+
 class PersonalizedTag(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="personalized_tags")
     platform = models.ForeignKey("Platform", on_delete=models.CASCADE, related_name="personalized_tags")
@@ -108,3 +134,54 @@ class PersonalizedTag(models.Model):
 
 
 
+
+
+class OfferImportJob(models.Model):
+    """Queued offer workbook upload, processed by `manage.py run_offer_import_worker` off the request path."""
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_APPLIED = "applied"   # dry runs whose real import has been queued
+    STATUS_EXPIRED = "expired"   # dry runs never applied; their upload has been dropped
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+        (STATUS_APPLIED, "Applied"),
+        (STATUS_EXPIRED, "Expired"),
+    ]
+
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    file_name = models.CharField(max_length=255)
+    upload = models.BinaryField()   # emptied once a real import has run, or its dry run is applied or expires
+    dry_run = models.BooleanField(default=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    locked_at = models.DateTimeField(null=True, blank=True)   # claim time, then refreshed after every chunk
+    applied_as = models.OneToOneField(
+        "self", on_delete=models.SET_NULL, null=True, blank=True, related_name="applied_from"
+    )
+
+    # progress, updated after every committed chunk
+    rows_processed = models.PositiveIntegerField(default=0)
+    networks = models.PositiveIntegerField(default=0)
+    offers = models.PositiveIntegerField(default=0)
+    links = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)   # [{"row": n, "error": "..."}], capped
+    diff = models.JSONField(null=True, blank=True)        # dry runs only
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{'Dry run' if self.dry_run else 'Import'} of {self.file_name} ({self.status})"
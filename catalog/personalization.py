@@ -0,0 +1,84 @@
+# Per-user personalization context: a user's platforms, active tag sets and tracking sets, cached as one object.
+import time
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import PersonalizedTag, Platform, TrackingParamSet
+
+CONTEXT_SCHEMA = 1           # bump when the cached shape changes
+CONTEXT_TTL = 60 * 60
+
+
+@dataclass
+class PersonalizationContext:
+    user_id: int
+    platforms: dict = field(default_factory=dict)   # platform pk -> Platform
+    tags: dict = field(default_factory=dict)        # platform pk -> active PersonalizedTag
+    tracking: dict = field(default_factory=dict)    # platform pk -> first active TrackingParamSet
+
+    def platform(self, pk):
+        return self.platforms.get(pk)
+
+
+def _version_key(user_id):
+    return f"personalization:ver:{user_id}"
+
+
+def _context_key(user_id, version):
+    return f"personalization:{CONTEXT_SCHEMA}:{user_id}:{version}"
+
+
+def _fresh_version():
+    # Time-based start so an evicted counter never comes back to a version that is still cached
+    return int(time.time() * 1000)
+
+
+def _version(user_id):
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        cache.add(_version_key(user_id), _fresh_version(), None)
+        version = cache.get(_version_key(user_id), 0)
+    return version
+
+
+def build_context(user_id):
+    platforms = {p.pk: p for p in Platform.objects.filter(created_by_id=user_id)}
+    ctx = PersonalizationContext(user_id=user_id, platforms=platforms)
+    if not platforms:
+        return ctx
+    for tag in PersonalizedTag.objects.filter(user_id=user_id, platform_id__in=platforms, is_active=True):
+        ctx.tags[tag.platform_id] = tag
+    for ts in TrackingParamSet.objects.filter(platform_id__in=platforms, is_active=True).order_by("-pk"):
+        ctx.tracking[ts.platform_id] = ts   # descending, so the lowest pk wins like .first()
+    return ctx
+
+
+def cache_enabled():
+    # invalidate() only reaches processes sharing the cache; a per-process LocMem would serve stale contexts
+    return getattr(settings, "PERSONALIZATION_CACHE", False)
+
+
+def get_context(user):
+    """Cached context for this user; rebuilt (3 queries) only after an invalidation or TTL expiry."""
+    if not cache_enabled():
+        return build_context(user.pk)
+    version = _version(user.pk)
+    key = _context_key(user.pk, version)
+    ctx = cache.get(key)
+    if ctx is None:
+        ctx = build_context(user.pk)
+        # Written under the version read *before* building, so a concurrent invalidation wins
+        cache.set(key, ctx, CONTEXT_TTL)
+    return ctx
+
+
+def invalidate(*user_ids):
+    if not cache_enabled():
+        return
+    for user_id in {u for u in user_ids if u}:
+        try:
+            cache.incr(_version_key(user_id))
+        except ValueError:
+            cache.add(_version_key(user_id), _fresh_version(), None)
@@ -0,0 +1,226 @@
+# Process-local offer search for the OfferLink autocomplete: token + trigram index over active offer/network names.
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from heapq import nsmallest
+
+from django.core.cache import cache
+
+from .models import OfferLink
+
+GENERATION_KEY = "catalog:generation"
+CHECK_SECONDS = 1.0   # how often a process asks the cache whether the catalog changed
+WORD = re.compile(r"\w+")
+
+
+# ---------- catalog generation ----------
+def catalog_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Time-based start so an evicted counter never repeats an old generation
+        cache.add(GENERATION_KEY, int(time.time() * 1000), None)
+        generation = cache.get(GENERATION_KEY, 0)
+    return generation
+
+
+def bump_catalog_generation():
+    """Call after any write to OfferNetwork, Offer or OfferLink; every process rebuilds its index."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, int(time.time() * 1000), None)
+
+
+def _normalize(text):
+    return " ".join(WORD.findall(text.casefold()))
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class _Tokens:
+    """Sorted token list with postings, for word-prefix lookups by bisection."""
+
+    def __init__(self, postings):
+        self.tokens = sorted(postings)
+        self.postings = [postings[t] for t in self.tokens]
+
+    def prefix(self, word):
+        start = bisect_left(self.tokens, word)
+        end = bisect_left(self.tokens, word + "\U0010ffff", start)
+        found = set()
+        for positions in self.postings[start:end]:
+            found.update(positions)
+        return found
+
+
+class OfferSearchIndex:
+    """
+    Built from (link_id, offer_name, network_name, url) rows. Results come in tiers, and later
+    tiers are only computed when the page is not full yet:
+      0. the offer name starts with the whole term (a bisect over the sorted names)
+      1. every word starts one of the offer name's words
+      2. every word starts a word of the offer or network name
+      3. every word of three or more characters occurs anywhere in them (the old icontains
+         semantics, through trigram postings)
+    Alphabetical by offer name within each tier.
+    """
+
+    # Above this many candidates, walk the name order and stop at the page instead of building sets
+    SCAN_ABOVE = 5000
+
+    def __init__(self, rows):
+        self.ids, self.labels, self.offers = array("q"), [], []
+        self.network_of, self.network_names, self.network_links = array("i"), [], []
+        networks, grams, offer_tokens = {}, {}, {}
+        for pos, (pk, offer, network, url) in enumerate(rows):
+            offer_n = _normalize(offer)
+            self.ids.append(pk)
+            self.labels.append(f"{network} — {offer} | {url[:50]}...")   # OfferLink.__str__
+            self.offers.append(offer_n)
+            n = networks.get(network)
+            if n is None:
+                n = networks[network] = len(self.network_names)
+                self.network_names.append(_normalize(network))
+                self.network_links.append(array("i"))
+            self.network_of.append(n)
+            self.network_links[n].append(pos)
+            for gram in _trigrams(offer_n):
+                grams.setdefault(gram, array("i")).append(pos)
+            for token in set(offer_n.split()):
+                offer_tokens.setdefault(token, array("i")).append(pos)
+        network_tokens, network_grams = {}, {}
+        for n, name in enumerate(self.network_names):
+            for token in set(name.split()):
+                network_tokens.setdefault(token, array("i")).append(n)
+            for gram in _trigrams(name):
+                network_grams.setdefault(gram, array("i")).append(n)
+        self.grams, self.network_grams = grams, network_grams
+        self.offer_tokens, self.network_tokens = _Tokens(offer_tokens), _Tokens(network_tokens)
+        # Positions in offer-name order: the empty-term listing, tier 0 by bisection, and the in-tier sort key
+        self.by_name = sorted(range(len(self.ids)), key=lambda p: (self.offers[p], self.ids[p]))
+        self.names = [self.offers[p] for p in self.by_name]
+        self.name_rank = array("i", bytes(4 * len(self.by_name)))
+        for rank, pos in enumerate(self.by_name):
+            self.name_rank[pos] = rank
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def _substring(word, grams, texts):
+        lists = sorted((grams.get(g, ()) for g in _trigrams(word)), key=len)
+        if not lists[0]:
+            return set()
+        found = set(lists[0])
+        for other in lists[1:]:
+            found.intersection_update(other)
+        if len(word) == 3:
+            return found
+        # Trigrams can all occur without the word itself; confirm against the text
+        return {i for i in found if word in texts[i]}
+
+    def _word(self, word, substring):
+        """(offer positions, network numbers) matching one word."""
+        if substring and len(word) >= 3:
+            return (self._substring(word, self.grams, self.offers),
+                    self._substring(word, self.network_grams, self.network_names))
+        return self.offer_tokens.prefix(word), self.network_tokens.prefix(word)
+
+    def _tier(self, matchers, need, seen):
+        """Up to `need` unseen positions, in name order, matching every (positions, networks) pair."""
+        def size(m):
+            return len(m[0]) + sum(len(self.network_links[n]) for n in m[1])
+
+        def matches(p, among):
+            return all(p in positions or self.network_of[p] in nets for positions, nets in among)
+
+        narrowest = min(matchers, key=size)
+        if size(narrowest) > self.SCAN_ABOVE:
+            found = []
+            for p in self.by_name:
+                if p not in seen and matches(p, matchers):
+                    found.append(p)
+                    if len(found) == need:
+                        break
+            return found
+        positions, nets = narrowest
+        candidates = set(positions)
+        for n in nets:
+            candidates.update(self.network_links[n])
+        if seen:
+            candidates.difference_update(seen)
+        # Candidates already satisfy the narrowest word
+        others = [m for m in matchers if m is not narrowest]
+        if others:
+            candidates = [p for p in candidates if matches(p, others)]
+        return nsmallest(need, candidates, key=self.name_rank.__getitem__)
+
+    def _tiers(self, term, words, need, seen):
+        start = bisect_left(self.names, term)
+        yield self.by_name[start:bisect_left(self.names, term + "\U0010ffff", start)][:need]   # already in order
+        prefixes = [self._word(w, substring=False) for w in words]
+        yield self._tier([(positions, set()) for positions, _ in prefixes], need, seen)
+        yield self._tier(prefixes, need, seen)
+        if any(len(w) >= 3 for w in words):
+            yield self._tier([self._word(w, substring=True) for w in words], need, seen)
+
+    def search(self, term, offset=0, limit=25):
+        """([(link_id, label), ...], more) for one page of results."""
+        term = _normalize(term)
+        if not term:
+            page = self.by_name[offset:offset + limit]
+            return [(self.ids[p], self.labels[p]) for p in page], offset + limit < len(self.by_name)
+
+        need = offset + limit + 1   # one extra tells whether there is a next page
+        words = sorted(set(term.split()), key=len, reverse=True)
+        ranked, seen = [], set()
+        for tier in self._tiers(term, words, need, seen):
+            ranked += tier[:need - len(ranked)]
+            if len(ranked) >= need:
+                break
+            seen.update(tier)
+        page = ranked[offset:offset + limit]
+        return [(self.ids[p], self.labels[p]) for p in page], len(ranked) > offset + limit
+
+
+def build_offer_index():
+    rows = OfferLink.objects.filter(is_active=True).values_list(
+        "pk", "offer__name", "offer__network__name", "url"
+    ).iterator(chunk_size=5000)
+    return OfferSearchIndex(rows)
+
+
+_lock = threading.Lock()
+_state = {"index": None, "generation": None, "checked": 0.0}
+
+
+def get_offer_index():
+    """
+    This process's index, rebuilt once the catalog generation has moved on. One thread builds the
+    replacement while the others keep answering from the current index; only the very first build
+    makes readers wait.
+    """
+    now = time.monotonic()
+    index = _state["index"]
+    if index is not None and now - _state["checked"] < CHECK_SECONDS:
+        return index
+    _state["checked"] = now
+    generation = catalog_generation()
+    if index is not None and generation == _state["generation"]:
+        return index
+    if not _lock.acquire(blocking=index is None):
+        return index   # another thread is building the replacement
+    try:
+        # It may have been rebuilt while we waited
+        if _state["index"] is None or generation != _state["generation"]:
+            fresh = build_offer_index()
+            # Generation first: a reader that sees it early just answers from the old index once more
+            _state["generation"] = generation
+            _state["index"] = fresh
+    finally:
+        _lock.release()
+    return _state["index"]
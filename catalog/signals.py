@@ -0,0 +1,53 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import personalization
+from .cta import invalidate_offer_links, invalidate_tracking_sets
+from .models import Offer, OfferLink, OfferNetwork, PersonalizedTag, Platform, TrackingParamSet
+from .search import bump_catalog_generation
+
+
+@receiver(post_save, sender=OfferLink)
+def invalidate_link_ctas(sender, instance: OfferLink, update_fields=None, **kwargs):
+    # Deletes cascade on their own; only url / is_active change the resolved rows
+    if update_fields is not None and not {"url", "is_active"} & set(update_fields):
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: invalidate_offer_links([pk]))
+
+
+@receiver(post_save, sender=TrackingParamSet)
+def invalidate_tracking_ctas(sender, instance: TrackingParamSet, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: invalidate_tracking_sets([pk]))
+
+
+# ---------- personalization context invalidation ----------
+@receiver([post_save, post_delete], sender=Platform)
+def invalidate_platform_owner(sender, instance: Platform, **kwargs):
+    personalization.invalidate(instance.created_by_id)
+
+
+@receiver([post_save, post_delete], sender=PersonalizedTag)
+def invalidate_tag_owner(sender, instance: PersonalizedTag, **kwargs):
+    personalization.invalidate(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=TrackingParamSet)
+def invalidate_tracking_owners(sender, instance: TrackingParamSet, **kwargs):
+    # The set's creator and the platform's owner can differ; both contexts may hold it
+    owner_id = (
+        Platform.objects.filter(pk=instance.platform_id).values_list("created_by_id", flat=True).first()
+        if instance.platform_id else None
+    )
+    personalization.invalidate(instance.created_by_id, owner_id)
+
+
+# ---------- offer search index invalidation ----------
+@receiver([post_save, post_delete], sender=OfferNetwork)
+@receiver([post_save, post_delete], sender=Offer)
+@receiver([post_save, post_delete], sender=OfferLink)
+def bump_catalog(sender, **kwargs):
+    # After commit, so no process rebuilds its index from rows that are about to be rolled back
+    transaction.on_commit(bump_catalog_generation)
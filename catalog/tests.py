@@ -0,0 +1,106 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .jobs import DRY_RUN_TTL, apply_dry_run, expire_dry_runs
+from .models import Offer, OfferImportJob, OfferLink, OfferNetwork, Platform, TrackingParamSet
+
+User = get_user_model()
+
+
+class ParamDetailConditionalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("tracker")
+        platform = Platform.objects.create(name="Mailer", created_by=cls.user)
+        cls.params = TrackingParamSet.objects.create(platform=platform, params={"utm_source": "x"}, created_by=cls.user)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse("catalog:param_detail_json", args=[self.params.pk])
+        self.first = self.client.get(self.url)
+
+    def assertNotModified(self, **headers):
+        # session, user and the updated_at lookup; the set itself is never fetched or serialized
+        with mock.patch("catalog.views.JsonResponse") as json_response, self.assertNumQueries(3):
+            response = self.client.get(self.url, headers=headers)
+        self.assertEqual(response.status_code, 304)
+        json_response.assert_not_called()
+
+    def test_etag_match_is_not_modified(self):
+        self.assertNotModified(if_none_match=self.first["ETag"])
+
+    def test_last_modified_is_not_modified(self):
+        self.assertNotModified(if_modified_since=self.first["Last-Modified"])
+
+    def test_change_is_served_again(self):
+        self.params.params = {"utm_source": "y"}
+        self.params.save()
+        response = self.client.get(self.url, headers={"if_none_match": self.first["ETag"]})
+        self.assertEqual(response.status_code, 200)
+
+
+class ApplyDryRunTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("importer")
+        self.dry_run = OfferImportJob.objects.create(
+            created_by=self.user, file_name="offers.csv", upload=b"network,offer,url\n",
+            dry_run=True, status=OfferImportJob.STATUS_DONE,
+        )
+
+    def test_applying_twice_queues_one_import(self):
+        first = apply_dry_run(self.dry_run, self.user)
+        second = apply_dry_run(self.dry_run, self.user)
+        self.assertEqual(first, second)
+        self.assertEqual(OfferImportJob.objects.filter(dry_run=False).count(), 1)
+        self.dry_run.refresh_from_db()
+        self.assertEqual(self.dry_run.status, OfferImportJob.STATUS_APPLIED)
+        self.assertEqual(self.dry_run.applied_as, first)
+        # Only the real job keeps the file
+        self.assertEqual(bytes(self.dry_run.upload), b"")
+        self.assertEqual(bytes(first.upload), b"network,offer,url\n")
+
+    def test_unapplied_dry_run_expires(self):
+        self.assertEqual(expire_dry_runs(), 0)
+        OfferImportJob.objects.filter(pk=self.dry_run.pk).update(updated_at=timezone.now() - DRY_RUN_TTL * 2)
+        self.assertEqual(expire_dry_runs(), 1)
+        self.dry_run.refresh_from_db()
+        self.assertEqual(self.dry_run.status, OfferImportJob.STATUS_EXPIRED)
+        self.assertEqual(bytes(self.dry_run.upload), b"")
+        self.assertIsNone(apply_dry_run(self.dry_run, self.user))
+
+    def test_unfinished_dry_run_is_not_applied(self):
+        OfferImportJob.objects.filter(pk=self.dry_run.pk).update(status=OfferImportJob.STATUS_RUNNING)
+        self.assertIsNone(apply_dry_run(self.dry_run, self.user))
+        self.assertFalse(OfferImportJob.objects.filter(dry_run=False).exists())
+
+
+class OfferExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user("exporter", is_staff=True)
+        network = OfferNetwork.objects.create(name="Net")
+        for i in range(3):
+            offer = Offer.objects.create(network=network, name=f"Offer {i}")
+            OfferLink.objects.create(offer=offer, url=f"https://offers.example/{i}")
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def test_xlsx_within_limit_is_served(self):
+        response = self.client.get(reverse("catalog:offer_export"), {"format": "xlsx"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="offer-catalog.xlsx"')
+
+    @override_settings(OFFER_XLSX_EXPORT_MAX_ROWS=2)
+    def test_xlsx_over_limit_is_refused(self):
+        response = self.client.get(reverse("catalog:offer_export"), {"format": "xlsx", "status": "active"})
+        self.assertRedirects(response, reverse("catalog:offer_index") + "?status=active", fetch_redirect_response=False)
+
+    @override_settings(OFFER_XLSX_EXPORT_MAX_ROWS=2)
+    def test_csv_has_no_limit(self):
+        response = self.client.get(reverse("catalog:offer_export"), {"format": "csv"})
+        self.assertEqual(len(b"".join(response.streaming_content).splitlines()), 4)
@@ -15,7 +15,13 @@ urlpatterns = [
     path('tracking/<int:pk>/delete/', views.param_delete, name='param_delete'),
     # Admin-only screens for Offer Links (hidden for non-staff in navbar)
     path("offers/", views.offer_index, name="offer_index"),
+    path("offers/api/networks.json", views.offer_browser_networks, name="offer_browser_networks"),
+    path("offers/api/networks/<int:pk>/offers.json", views.offer_browser_offers, name="offer_browser_offers"),
     path("offers/upload/", views.upload_offer_links, name="upload_offer_links"),
+    path("offers/export/", views.offer_export, name="offer_export"),
+    path("offers/imports/<int:pk>/", views.offer_import_job, name="offer_import_job"),
+    path("offers/imports/<int:pk>.json", views.offer_import_job_json, name="offer_import_job_json"),
+    path("offers/imports/<int:pk>/apply/", views.offer_import_job_apply, name="offer_import_job_apply"),
     
     path("offers/link/add/", views.offer_link_add, name="offer_link_add"),
     path("offers/link/<int:pk>/edit/", views.offer_link_edit, name="offer_link_edit"),
@@ -1,20 +1,26 @@
+import tempfile
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from .models import Platform, TrackingParamSet, OfferNetwork, Offer, OfferLink, OfferNetwork as Network
+from .models import Platform, TrackingParamSet, OfferNetwork, Offer, OfferLink, OfferImportJob, OfferNetwork as Network
+from .browse import network_page, offer_page
+from .exporters import FORMATS as EXPORT_FORMATS, XLSX_MAX_ROWS, catalog_count, catalog_rows, offer_filters, stream_csv, write_xlsx
+from .jobs import apply_dry_run, enqueue_import
 from .forms import PlatformForm, TrackingParamSetForm , OfferLinkWithOfferForm
 from django import forms
-from django.db.models import Prefetch
+from django.conf import settings
 from django.urls import reverse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.admin.views.decorators import staff_member_required
-from django.http import JsonResponse, HttpResponseBadRequest
+from django.http import FileResponse, JsonResponse, HttpResponseBadRequest, StreamingHttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
 from django.urls import reverse
 from django.contrib import messages
 from .models import PersonalizedTag, Platform
 from .forms import PersonalizedTagForm
-import pandas as pd
 
 
 
@@ -88,168 +94,114 @@ def upload_offer_links(request):
         excel_file = request.FILES["excel_file"]
 
         try:
-            import pandas as pd
-
-            df = pd.read_excel(excel_file)
-            df = df.dropna(subset=['network', 'offer', 'url'])
-
-            # Fetch existing items
-            existing_networks = {n.name: n for n in OfferNetwork.objects.all()}
-            existing_offers = {(o.network.name, o.name): o for o in Offer.objects.select_related('network')}
-            existing_links = {(l.offer.network.name, l.offer.name): l for l in OfferLink.objects.select_related('offer__network')}
-
-            new_networks = []
-            new_offers = []
-            new_links = []
-
-            created_networks = 0
-            created_offers = 0
-            created_links = 0
-            updated_links = 0
-            skipped_rows = 0
-
-            # 1️⃣ Create in-memory lists
-            for _, row in df.iterrows():
-                network_name = str(row['network']).strip()
-                offer_name = str(row['offer']).strip()
-                url = str(row['url']).strip()
-                is_active = bool(row.get('is_active', True))
-
-                if not all([network_name, offer_name, url]):
-                    skipped_rows += 1
-                    continue
-
-                # --- NETWORK ---
-                network_obj = existing_networks.get(network_name)
-                if not network_obj:
-                    network_obj = OfferNetwork(name=network_name)
-                    new_networks.append(network_obj)
-                    existing_networks[network_name] = network_obj
-
-                # --- OFFER ---
-                offer_key = (network_name, offer_name)
-                offer_obj = existing_offers.get(offer_key)
-                if not offer_obj:
-                    offer_obj = Offer(network=network_obj, name=offer_name)
-                    new_offers.append(offer_obj)
-                    existing_offers[offer_key] = offer_obj
-
-                # --- LINK ---
-                link_key = (network_name, offer_name)
-                link_obj = existing_links.get(link_key)
-
-                if link_obj:
-                    if link_obj.url != url or link_obj.is_active != is_active:
-                        link_obj.url = url
-                        link_obj.is_active = is_active
-                        link_obj.save(update_fields=['url', 'is_active'])
-                        updated_links += 1
-                else:
-                    link_obj = OfferLink(offer=offer_obj, url=url, is_active=is_active, created_by=request.user)
-                    new_links.append(link_obj)
-                    existing_links[link_key] = link_obj
-
-            # 2️⃣ Save new networks first
-            if new_networks:
-                OfferNetwork.objects.bulk_create(new_networks, ignore_conflicts=True)
-                created_networks = len(new_networks)
-
-                # refresh from DB (to get IDs)
-                saved_networks = OfferNetwork.objects.filter(
-                    name__in=[n.name for n in new_networks]
-                )
-                for n in saved_networks:
-                    existing_networks[n.name] = n
-
-            # 3️⃣ Save new offers next
-            if new_offers:
-                for o in new_offers:
-                    o.network = existing_networks[o.network.name]  # now has ID
-                Offer.objects.bulk_create(new_offers, ignore_conflicts=True)
-                created_offers = len(new_offers)
-
-                # refresh offers with IDs
-                saved_offers = Offer.objects.select_related('network').filter(
-                    name__in=[o.name for o in new_offers]
-                )
-                for o in saved_offers:
-                    existing_offers[(o.network.name, o.name)] = o
-
-            # 4️⃣ Finally, save new links
-            if new_links:
-                for l in new_links:
-                    l.offer = existing_offers[(l.offer.network.name, l.offer.name)]
-                OfferLink.objects.bulk_create(new_links, ignore_conflicts=True)
-                created_links = len(new_links)
-
-            messages.success(request, f"✅ Excel processed successfully! "
-                                      f"{created_networks} networks, "
-                                      f"{created_offers} offers, "
-                                      f"{created_links} new links, "
-                                      f"{updated_links} updated, "
-                                      f"{skipped_rows} skipped.")
-
-        except Exception as e:
-            messages.error(request, f"❌ Error processing Excel: {e}")
-
-        return redirect('catalog:offer_index')
+            job = enqueue_import(excel_file, request.user, dry_run=bool(request.POST.get("dry_run")))
+        except ValueError as e:
+            messages.error(request, f"❌ {e}")
+            return redirect('catalog:offer_index')
+        return redirect('catalog:offer_import_job', pk=job.pk)
+
 
     return render(request, "catalog/offer_index.html", {
         "all_networks": OfferNetwork.objects.all()
     })
 
-from django.db.models import Q, Prefetch
+def _import_job_json(job):
+    return {
+        "id": job.pk,
+        "file_name": job.file_name,
+        "dry_run": job.dry_run,
+        "status": job.status,
+        "rows_processed": job.rows_processed,
+        "networks": job.networks,
+        "offers": job.offers,
+        "created": job.links,
+        "updated": job.updated,
+        "skipped": job.skipped,
+        "errors": job.errors,
+        "diff": job.diff,
+        "last_error": job.last_error,
+    }
 
 @login_required
 @user_passes_test(staff_only)
-def offer_index(request):
-    net_id = request.GET.get("network") or ""
-    offer_q = request.GET.get("offer") or ""
-    status = request.GET.get("status") or ""  # "", "active", "inactive"
-
-    # Base link filter
-    link_filter = Q()
-    if status == "active":
-        link_filter = Q(is_active=True)
-    elif status == "inactive":
-        link_filter = Q(is_active=False)
-
-    # Prefetch links with filter
-    prefetch_links = Prefetch(
-        'links',
-        queryset=OfferLink.objects.filter(link_filter).select_related('offer'),
-        to_attr='filtered_links'
-    )
+def offer_import_job(request, pk):
+    job = get_object_or_404(OfferImportJob.objects.defer("upload"), pk=pk)
+    return render(request, "catalog/offer_import_job.html", {"job": job})
 
-    # Base offer filter
-    offers_qs = Offer.objects.all().select_related('network').prefetch_related(prefetch_links)
-    if offer_q:
-        offers_qs = offers_qs.filter(name__icontains=offer_q)
-
-    # Only keep offers that have links if status filter is applied
-    if status in ('active', 'inactive'):
-        offers_qs = offers_qs.filter(links__is_active=(status == 'active'))
-
-    # Prefetch offers per network
-    networks_qs = OfferNetwork.objects.all().prefetch_related(
-        Prefetch('offers', queryset=offers_qs, to_attr='filtered_offers')
-    )
-
-    # Optional network filter
-    if net_id:
-        networks_qs = networks_qs.filter(id=net_id)
+@login_required
+@user_passes_test(staff_only)
+def offer_import_job_json(request, pk):
+    # Polled by offer_import_job.html while the worker runs
+    job = get_object_or_404(OfferImportJob.objects.defer("upload"), pk=pk)
+    return JsonResponse(_import_job_json(job))
 
-    # If filters applied, remove networks with no filtered offers
-    networks_qs = [net for net in networks_qs if getattr(net, 'filtered_offers', [])]
+@login_required
+@user_passes_test(staff_only)
+def offer_import_job_apply(request, pk):
+    job = get_object_or_404(OfferImportJob.objects.defer("upload"), pk=pk, dry_run=True)
+    if request.method != "POST":
+        return redirect('catalog:offer_import_job', pk=job.pk)
+    applied = apply_dry_run(job, request.user)
+    if applied is None:
+        messages.error(request, "Only a finished preview that has not expired can be applied.")
+        return redirect('catalog:offer_import_job', pk=job.pk)
+    return redirect('catalog:offer_import_job', pk=applied.pk)
 
-    # Order networks
-    networks_qs.sort(key=lambda x: x.name)
 
+@login_required
+@user_passes_test(staff_only)
+def offer_index(request):
+    # Only the page shell: networks and their offers are loaded from the offer_browser_* JSON views
     return render(request, "catalog/offer_index.html", {
-        "networks": networks_qs,
         "all_networks": OfferNetwork.objects.order_by('name'),
+        "export_query": request.GET.urlencode(),
     })
 
+@login_required
+@user_passes_test(staff_only)
+def offer_browser_networks(request):
+    return JsonResponse(network_page(offer_filters(request.GET), request.GET.get("page")))
+
+@login_required
+@user_passes_test(staff_only)
+def offer_browser_offers(request, pk):
+    return JsonResponse(offer_page(pk, offer_filters(request.GET), request.GET.get("page")))
+
+@login_required
+@user_passes_test(staff_only)
+def offer_export(request):
+    """
+    The (filtered) catalog as a CSV or XLSX file the upload form accepts back. CSV streams at any
+    size. openpyxl only assembles the XLSX zip on save, so the whole workbook is built before the
+    first byte goes out; past OFFER_XLSX_EXPORT_MAX_ROWS that would outlast the worker timeout, and
+    such exports are refused in favour of CSV or `manage.py export_offer_catalog --format xlsx`.
+    """
+    fmt = request.GET.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        return HttpResponseBadRequest("format must be csv or xlsx")
+    filters = offer_filters(request.GET)
+    filename = f"offer-catalog.{fmt}"
+    if fmt == "csv":
+        response = StreamingHttpResponse(stream_csv(catalog_rows(filters)), content_type="text/csv; charset=utf-8")
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+    limit = getattr(settings, "OFFER_XLSX_EXPORT_MAX_ROWS", XLSX_MAX_ROWS)
+    total = catalog_count(filters)
+    if total > limit:
+        query = request.GET.copy()
+        query.pop("format", None)
+        messages.error(
+            request,
+            f"{total:,} links is too many for an XLSX download (limit {limit:,}). Export CSV instead, "
+            f"or run `manage.py export_offer_catalog --format xlsx --output <file>` on the server.",
+        )
+        return redirect(f"{reverse('catalog:offer_index')}?{query.urlencode()}")
+    rows = catalog_rows(filters)
+    fh = tempfile.TemporaryFile()
+    write_xlsx(rows, fh)
+    fh.seek(0)
+    return FileResponse(fh, as_attachment=True, filename=filename)
+
 class OfferLinkForm(forms.ModelForm):
     class Meta:
         model = OfferLink
@@ -497,7 +449,22 @@ def param_index(request):
     return render(request, 'catalog/param_index.html', {'form': form, 'params': params})
 
 
+def _param_version(request, pk):
+    if not hasattr(request, "_param_version"):
+        request._param_version = (
+            TrackingParamSet.objects.filter(pk=pk, created_by=request.user)
+            .values_list("updated_at", flat=True).first()
+        )
+    return request._param_version
+
+def _param_etag(request, pk):
+    updated_at = _param_version(request, pk)
+    return f'"params-{pk}-{int(updated_at.timestamp() * 1_000_000)}"' if updated_at else None
+
 @login_required
+@cache_control(private=True, max_age=0, must_revalidate=True)
+@vary_on_cookie
+@condition(etag_func=_param_etag, last_modified_func=_param_version)
 def param_detail_json(request, pk):
     obj = get_object_or_404(TrackingParamSet, pk=pk, created_by=request.user)
     data = {
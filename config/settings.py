@@ -22,6 +22,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
 
     # Your apps
     "accounts.apps.AccountsConfig",
@@ -118,6 +119,25 @@ CLOUDINARY_STORAGE = {
     "API_SECRET": os.environ.get("CLOUDINARY_API_SECRET"),
 }
 
+# ----------------------------
+# SNAPSHOTS (Playwright renderer pool)
+# ----------------------------
+SNAPSHOT_POOL_SIZE = int(os.environ.get("SNAPSHOT_POOL_SIZE", "2"))
+SNAPSHOT_RECYCLE_AFTER = int(os.environ.get("SNAPSHOT_RECYCLE_AFTER", "200"))
+SNAPSHOT_RENDER_TIMEOUT = float(os.environ.get("SNAPSHOT_RENDER_TIMEOUT", "15"))
+# Network isolation: only images/CSS/fonts are fetched, each bounded by SNAPSHOT_RESOURCE_TIMEOUT
+SNAPSHOT_INTERCEPT_REQUESTS = os.environ.get("SNAPSHOT_INTERCEPT_REQUESTS", "True") == "True"
+SNAPSHOT_RESOURCE_TIMEOUT = float(os.environ.get("SNAPSHOT_RESOURCE_TIMEOUT", "3"))
+SNAPSHOT_READY_TIMEOUT = float(os.environ.get("SNAPSHOT_READY_TIMEOUT", "5"))
+SNAPSHOT_ASSET_CACHE_BYTES = int(os.environ.get("SNAPSHOT_ASSET_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+# ----------------------------
+# MAIL MERGE
+# ----------------------------
+# 0 keeps bulk merges in the request process; >0 fans large uploads out to that many worker processes
+MAIL_MERGE_WORKERS = int(os.environ.get("MAIL_MERGE_WORKERS", "0"))
+MAIL_MERGE_POOL_MIN_BYTES = int(os.environ.get("MAIL_MERGE_POOL_MIN_BYTES", str(5 * 1024 * 1024)))
+
 # ----------------------------
 # LOGIN REDIRECT
 # ----------------------------
@@ -127,8 +147,18 @@ LOGOUT_REDIRECT_URL = "emails:home"
 # DEFAULT PK FIELD TYPE
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Per-user personalization contexts (and other shared state) must be visible to every
+# gunicorn worker, so the default cache moves to Redis whenever REDIS_URL is set.
+REDIS_URL = os.environ.get("REDIS_URL", "")
+
 CACHES = {
     "default": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": REDIS_URL,
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+        },
+    } if REDIS_URL else {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
     },
     "select2": {
@@ -141,3 +171,17 @@ CACHES = {
 }
 
 SELECT2_CACHE_BACKEND = "select2"
+
+# Cache per-user personalization contexts (catalog.personalization). Invalidations must reach every
+# worker, so this needs the shared Redis cache; without it the context is built on each request.
+PERSONALIZATION_CACHE = os.environ.get("PERSONALIZATION_CACHE", str(bool(REDIS_URL))) == "True"
+
+# Buffer TemplateUsage increments in the cache and let `flush_template_usage` write them.
+# Needs the shared Redis cache; without it every use is written straight through.
+TEMPLATE_USAGE_WRITE_BEHIND = os.environ.get("TEMPLATE_USAGE_WRITE_BEHIND", str(bool(REDIS_URL))) == "True"
+
+# Show "~N templates" on cursor-paginated listings, from the PostgreSQL planner estimate (no COUNT(*))
+TEMPLATE_LIST_ESTIMATES = os.environ.get("TEMPLATE_LIST_ESTIMATES", "True") == "True"
+
+# Anonymous gallery pages are served from the cache for this long (0 disables); see emails.page_cache
+GALLERY_PAGE_CACHE_SECONDS = int(os.environ.get("GALLERY_PAGE_CACHE_SECONDS", "60"))
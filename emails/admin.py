@@ -1,8 +1,9 @@
 from django.contrib import admin
-from django.utils.html import format_html
-from django.core.files.base import ContentFile
-from .models import EmailTemplate, TemplateUsage
-from .snapshot import render_html_to_snapshot_content
+from django.db.models import Q
+from .models import EmailTemplate, TemplateCard, TemplateUsage, SnapshotJob
+from .jobs import enqueue_snapshot, store_derivatives
+from .search import full_text_enabled, full_text_q
+from .templatetags.snapshot_tags import snapshot_picture
 
 
 class TemplateUsageInline(admin.TabularInline):  # or StackedInline for vertical view
@@ -33,7 +34,7 @@ class EmailTemplateAdmin(admin.ModelAdmin):
         "updated_at",
     )
     ordering = ("-updated_at",)
-    actions = ["regenerate_snapshot", "make_public", "make_private"]
+    actions = ["regenerate_snapshot", "regenerate_derivatives", "make_public", "make_private"]
     inlines = [TemplateUsageInline]
 
     def template_id(self, obj):
@@ -44,23 +45,56 @@ class EmailTemplateAdmin(admin.ModelAdmin):
 
     def thumb(self, obj):
         if obj.snapshot:
-            return format_html('<img src="{}" style="height:40px;border-radius:6px"/>', obj.snapshot.url)
+            return snapshot_picture(obj, "thumb", style="height:40px;width:auto;border-radius:6px", sizes="54px")
         return "-"
     thumb.short_description = "Snapshot"
 
+    def get_search_results(self, request, queryset, search_term):
+        # On PostgreSQL the indexed search vector stands in for LIKE over the bodies (it covers
+        # body_text, not the markup of body_html); owner and template_id are still matched directly
+        term = search_term.strip()
+        if not full_text_enabled() or not term:
+            return super().get_search_results(request, queryset, search_term)
+        match = full_text_q(term) | Q(owner__username__icontains=term)
+        # A bare number is the pk, unless it is (part of) an all-digit template_id
+        if term.isdigit() and not queryset.filter(template_id__contains=term).exists():
+            match |= Q(pk=int(term))
+        return queryset.filter(match), False
+
     @admin.action(description="Regenerate snapshot")
     def regenerate_snapshot(self, request, queryset):
-        for obj in queryset:
-            content: ContentFile = render_html_to_snapshot_content(obj.body_html or "")
-            obj.snapshot.save(f"template_{obj.pk}.png", content, save=True)
+        count = 0
+        for obj in queryset.only("pk"):
+            enqueue_snapshot(obj)
+            count += 1
+        self.message_user(request, f"Queued {count} snapshot(s); run_snapshot_worker will render them.")
+
+    @admin.action(description="Regenerate snapshot thumbnails (WebP/PNG)")
+    def regenerate_derivatives(self, request, queryset):
+        seen, count = set(), 0
+        for obj in queryset.exclude(snapshot="").exclude(snapshot__isnull=True):
+            if obj.snapshot.name in seen:
+                continue  # shared image; already rebuilt for every template using it
+            seen.add(obj.snapshot.name)
+            store_derivatives(obj)
+            count += 1
+        self.message_user(request, f"Rebuilt derivatives for {count} snapshot image(s).")
 
     @admin.action(description="Mark selected templates as PUBLIC")
     def make_public(self, request, queryset):
+        # pks first: a changelist filtered on is_public would match none of them after the update
+        pks = list(queryset.values_list("pk", flat=True))
         queryset.update(is_public=True)
+        # update() skips signals: refresh the cards (which also bumps the gallery page-cache generation)
+        TemplateCard.refresh(pks)
 
     @admin.action(description="Mark selected templates as PRIVATE")
     def make_private(self, request, queryset):
+        # pks first: a changelist filtered on is_public would match none of them after the update
+        pks = list(queryset.values_list("pk", flat=True))
         queryset.update(is_public=False)
+        # update() skips signals: refresh the cards (which also bumps the gallery page-cache generation)
+        TemplateCard.refresh(pks)
 
 @admin.register(TemplateUsage)
 class TemplateUsageAdmin(admin.ModelAdmin):
@@ -68,3 +102,14 @@ class TemplateUsageAdmin(admin.ModelAdmin):
     list_filter = ("template", "user")
     search_fields = ("template__title", "user__username", "user__email")
     ordering = ("-last_used_at",)
+
+
+@admin.register(SnapshotJob)
+class SnapshotJobAdmin(admin.ModelAdmin):
+    list_display = ("template", "status", "attempts", "run_after", "updated_at")
+    list_filter = ("status",)
+    search_fields = ("template__title", "template__template_id", "last_error")
+    readonly_fields = ("created_at", "updated_at", "locked_at")
+    raw_id_fields = ("template",)
+    ordering = ("-updated_at",)
+
@@ -0,0 +1,110 @@
+# Incremental usage rollups (hourly/daily) and the leaderboard that reads them.
+from datetime import timedelta
+from itertools import islice
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+from .models import RollupCursor, UsageDaily, UsageEvent, UsageHourly
+
+CURSOR_NAME = "usage"
+# Events newer than this may still sit in an open transaction with a lower id; leave them for the next run
+COMMIT_LAG = timedelta(seconds=30)
+FOLD_BATCH = 1000   # groups per upsert statement
+
+LEADERBOARD_PERIODS = {
+    "day": (UsageHourly, timedelta(hours=24)),
+    "week": (UsageDaily, timedelta(days=7)),
+    "month": (UsageDaily, timedelta(days=30)),
+}
+LEADERBOARD_TTL = 300
+
+
+def _fold(model, groups):
+    """
+    Add each group's uses onto its rollup row: one INSERT .. ON CONFLICT per FOLD_BATCH groups,
+    against the (bucket, template, platform, network) unique key.
+    """
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    bucket_field = model._meta.get_field("bucket")
+    columns = ", ".join(qn(c) for c in ("bucket", "template_id", "platform_id", "network_id", "uses"))
+    key = (
+        f"{qn('bucket')}, {qn('template_id')}, "
+        f"COALESCE({qn('platform_id')}, 0), COALESCE({qn('network_id')}, 0)"
+    )
+    groups = iter(groups)
+    while batch := list(islice(groups, FOLD_BATCH)):
+        params = []
+        for g in batch:
+            params.extend([
+                bucket_field.get_db_prep_value(g["bucket"], connection),
+                g["template_id"], g["platform_id"], g["network_id"], g["uses"],
+            ])
+        sql = (
+            f"INSERT INTO {table} ({columns}) VALUES {', '.join(['(%s, %s, %s, %s, %s)'] * len(batch))} "
+            f"ON CONFLICT ({key}) DO UPDATE SET {qn('uses')} = {table}.{qn('uses')} + EXCLUDED.{qn('uses')}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+
+def _grouped(events, trunc):
+    return (
+        events.annotate(bucket=trunc("occurred_at"), network_id=F("offer_link__offer__network_id"))
+        .values("bucket", "template_id", "platform_id", "network_id")
+        .annotate(uses=Sum("count"))
+        .order_by()
+    )
+
+
+def rollup_new_events(batch_size=50000):
+    """Fold events past the cursor into the hourly and daily tables. Returns the number of events processed."""
+    processed = 0
+    while True:
+        with transaction.atomic():
+            cursor, _ = RollupCursor.objects.select_for_update().get_or_create(name=CURSOR_NAME)
+            ids = UsageEvent.objects.filter(
+                id__gt=cursor.last_event_id, recorded_at__lt=timezone.now() - COMMIT_LAG
+            ).order_by("id").values_list("id", flat=True)[:batch_size]
+            ids = list(ids)
+            if not ids:
+                return processed
+            events = UsageEvent.objects.filter(id__gt=cursor.last_event_id, id__lte=ids[-1])
+            _fold(UsageHourly, _grouped(events, TruncHour))
+            _fold(UsageDaily, _grouped(events, TruncDate))
+            cursor.last_event_id = ids[-1]
+            cursor.save(update_fields=["last_event_id", "updated_at"])
+        processed += len(ids)
+        if len(ids) < batch_size:
+            return processed
+
+
+def leaderboard(period="week", network_id=None, platform_id=None, limit=10):
+    """Most used public templates over the period, read from the rollups only (cached)."""
+    key = f"leaderboard:{period}:{network_id or '-'}:{platform_id or '-'}:{limit}"
+    rows = cache.get(key)
+    if rows is not None:
+        return rows
+
+    model, span = LEADERBOARD_PERIODS[period]
+    since = timezone.now() - span
+    qs = model.objects.filter(
+        bucket__gte=since if model is UsageHourly else since.date(), template__is_public=True
+    )
+    if network_id:
+        qs = qs.filter(network_id=network_id)
+    if platform_id:
+        qs = qs.filter(platform_id=platform_id)
+    rows = [
+        {"id": r["template_id"], "template_id": r["template__template_id"], "title": r["template__title"],
+         "uses": r["total"]}
+        for r in qs.values("template_id", "template__template_id", "template__title")
+        .annotate(total=Sum("uses"))
+        .order_by("-total", "template_id")[:limit]
+    ]
+    cache.set(key, rows, LEADERBOARD_TTL)
+    return rows
@@ -1,6 +1,7 @@
 
 from django import forms
 from .models import EmailTemplate
+from catalog.cta import with_cta
 from catalog.models import Platform, TrackingParamSet, OfferLink
 from django_select2.forms import ModelSelect2Widget
 from django import forms
@@ -58,8 +59,26 @@ class EmailTemplateForm(forms.ModelForm):
         return body_html
 
 
+class ContextPlatformField(forms.ModelChoiceField):
+    """Resolves the submitted pk against the cached personalization context instead of querying."""
+    platforms = None
+
+    def to_python(self, value):
+        if self.platforms is None or value in self.empty_values:
+            return super().to_python(value)
+        try:
+            obj = self.platforms.get(int(value))
+        except (TypeError, ValueError):
+            obj = None
+        if obj is None:
+            raise forms.ValidationError(
+                self.error_messages["invalid_choice"], code="invalid_choice", params={"value": value}
+            )
+        return obj
+
+
 class UseTemplateForm(forms.Form):
-    platform = forms.ModelChoiceField(queryset=Platform.objects.none(), required=False)
+    platform = ContextPlatformField(queryset=Platform.objects.none(), required=False)
     offer_link = forms.ModelChoiceField(
         queryset=OfferLink.objects.none(),
         required=False,
@@ -74,7 +93,34 @@ class UseTemplateForm(forms.Form):
 
     def __init__(self, *args, **kwargs):
         user = kwargs.pop('user', None)
+        personalization = kwargs.pop('personalization', None)
         super().__init__(*args, **kwargs)
         if user:
             self.fields['platform'].queryset = Platform.objects.filter(created_by=user)
-        self.fields['offer_link'].queryset = OfferLink.objects.filter(is_active=True)
\ No newline at end of file
+        links = OfferLink.objects.filter(is_active=True)
+        if personalization is not None:
+            self.fields['platform'].platforms = personalization.platforms
+            # The stored CTA URL comes back with the link validation query, so a POST reads the catalog once
+            links = with_cta(links, personalization.tracking.get(self._submitted_platform()))
+        self.fields['offer_link'].queryset = links
+
+    def _submitted_platform(self):
+        try:
+            return int(self.data.get(self.add_prefix('platform')))
+        except (TypeError, ValueError):
+            return None
+
+
+class BulkUseTemplateForm(UseTemplateForm):
+    recipients = forms.FileField(help_text="CSV or XLSX; the header row names the {{placeholders}} to fill.")
+    output_format = forms.ChoiceField(
+        choices=[("jsonl", "JSON Lines (one object per row)"), ("zip", "ZIP of HTML/text parts")],
+        initial="jsonl",
+    )
+
+    def clean_recipients(self):
+        upload = self.cleaned_data["recipients"]
+        if not upload.name.lower().endswith((".csv", ".xlsx")):
+            raise forms.ValidationError("Upload a .csv or .xlsx file.")
+        return upload
+
@@ -0,0 +1,186 @@
+import logging
+from datetime import timedelta
+from pathlib import Path
+
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import EmailTemplate, SnapshotJob, TemplateCard
+from .snapshot import build_derivatives, render_html_to_snapshot_content, snapshot_digest
+
+logger = logging.getLogger(__name__)
+
+# Retry backoff: 30s, 60s, 120s, ... capped at one hour
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+# A "running" job whose worker died is handed out again after this long
+STALE_LOCK_SECONDS = 600
+
+
+def enqueue_snapshot(template: EmailTemplate) -> None:
+    """Queue (or re-queue) a snapshot render for the given template."""
+    now = timezone.now()
+    rescheduled = SnapshotJob.objects.filter(
+        template=template, status=SnapshotJob.STATUS_PENDING
+    ).update(run_after=now, attempts=0, last_error="")
+    if rescheduled:
+        return
+    try:
+        with transaction.atomic():
+            SnapshotJob.objects.create(template=template, run_after=now)
+    except IntegrityError:
+        # Another request queued it concurrently; one pending job is enough.
+        pass
+
+
+def claim_snapshot_jobs(limit: int = 1) -> list[SnapshotJob]:
+    """
+    Atomically claim up to ``limit`` runnable jobs.
+    Uses SELECT ... FOR UPDATE SKIP LOCKED so several workers can poll safely.
+    """
+    now = timezone.now()
+    runnable = Q(status=SnapshotJob.STATUS_PENDING, run_after__lte=now) | Q(
+        status=SnapshotJob.STATUS_RUNNING,
+        locked_at__lt=now - timedelta(seconds=STALE_LOCK_SECONDS),
+    )
+    with transaction.atomic():
+        jobs = list(
+            SnapshotJob.objects.select_for_update(skip_locked=True)
+            .filter(runnable)
+            .order_by("run_after")[:limit]
+        )
+        if jobs:
+            SnapshotJob.objects.filter(pk__in=[j.pk for j in jobs]).update(
+                status=SnapshotJob.STATUS_RUNNING,
+                locked_at=now,
+                attempts=F("attempts") + 1,
+            )
+            for job in jobs:
+                job.status = SnapshotJob.STATUS_RUNNING
+                job.locked_at = now
+                job.attempts += 1
+    return jobs
+
+
+def find_shared_snapshot(digest: str) -> tuple[str, dict] | None:
+    """(storage name, variants) of an existing snapshot rendered from the same content digest, if any."""
+    return (
+        EmailTemplate.objects.filter(snapshot_digest=digest, snapshot_uploaded=False)
+        .exclude(snapshot="")
+        .exclude(snapshot__isnull=True)
+        .values_list("snapshot", "snapshot_variants")
+        .first()
+    )
+
+
+def generate_snapshot(template: EmailTemplate) -> None:
+    """Bring the template's snapshot (and its derivatives) up to date, reusing identical images."""
+    digest = template.body_digest or snapshot_digest(template.body_html)
+    if not (template.snapshot and template.snapshot_digest == digest):
+        if not link_shared_snapshot(template, digest):
+            store_snapshot(template, render_html_to_snapshot_content(template.body_html or ""), digest)
+            return
+    if not template.snapshot_variants:
+        store_derivatives(template)
+
+
+def link_shared_snapshot(template: EmailTemplate, digest: str | None = None, shared: tuple | None = None) -> bool:
+    """
+    Point the template at an existing identical snapshot, or at `shared` (storage name, variants)
+    when given. Returns False if a render is needed.
+    """
+    digest = digest or template.body_digest or snapshot_digest(template.body_html)
+    shared = shared or find_shared_snapshot(digest)
+    if not shared:
+        return False
+    name, variants = shared
+    _point_snapshot_at(template, name, digest, variants or {})
+    return True
+
+
+def store_snapshot(template: EmailTemplate, content: ContentFile, digest: str | None = None) -> None:
+    """Save rendered PNG content and its derivatives under content-addressed keys and point the template at them."""
+    digest = digest or snapshot_digest(template.body_html)
+    data = content.read()
+    content.seek(0)
+    filename = template.snapshot.field.generate_filename(template, f"{digest}.png")
+    name = template.snapshot.storage.save(filename, content)
+    variants = _save_derivatives(template, data, digest)
+    _point_snapshot_at(template, name, digest, variants)
+
+
+def store_derivatives(template: EmailTemplate) -> dict:
+    """(Re)build derivatives from the stored snapshot; every template sharing the image gets them."""
+    with template.snapshot.open("rb") as f:
+        data = f.read()
+    # Rendered images are content-addressed by digest; uploads keep their own file name
+    stem = (not template.snapshot_uploaded and template.snapshot_digest) or Path(template.snapshot.name).stem
+    variants = _save_derivatives(template, data, stem)
+    sharing = EmailTemplate.objects.filter(snapshot=template.snapshot.name)
+    sharing.update(snapshot_variants=variants)
+    TemplateCard.refresh(sharing.values_list("pk", flat=True))
+    template.snapshot_variants = variants
+    return variants
+
+
+def _save_derivatives(template: EmailTemplate, image_bytes: bytes, stem: str) -> dict:
+    field, storage = template.snapshot.field, template.snapshot.storage
+    variants = {}
+    for key, blob in build_derivatives(image_bytes).items():
+        size_name, fmt = key.split(".")
+        filename = field.generate_filename(template, f"{stem}-{size_name}.{fmt}")
+        variants[key] = storage.save(filename, ContentFile(blob))
+    return variants
+
+
+def _point_snapshot_at(template: EmailTemplate, name: str, digest: str, variants: dict) -> None:
+    old_name = template.snapshot.name if template.snapshot else None
+    old_variants = template.snapshot_variants or {}
+    # Queryset update: no post_save re-entry and no updated_at bump
+    EmailTemplate.objects.filter(pk=template.pk).update(
+        snapshot=name, snapshot_digest=digest, snapshot_variants=variants, snapshot_uploaded=False
+    )
+    template.snapshot.name = name
+    template.snapshot_digest = digest
+    template.snapshot_uploaded = False
+    template.snapshot_variants = variants
+    TemplateCard.refresh([template.pk])
+
+    # Snapshots are shared between templates; only drop files nobody references any more.
+    if old_name and old_name != name and not EmailTemplate.objects.filter(snapshot=old_name).exists():
+        for stale in [old_name, *old_variants.values()]:
+            try:
+                template.snapshot.storage.delete(stale)
+            except Exception:
+                logger.warning("Failed to delete old snapshot file %s", stale)
+
+
+def run_snapshot_job(job: SnapshotJob) -> bool:
+    """Process one claimed job. Returns True on success."""
+    try:
+        template = EmailTemplate.objects.get(pk=job.template_id)
+        generate_snapshot(template)
+    except Exception as e:
+        logger.exception("Snapshot job %s failed: %s", job.pk, e)
+        if job.attempts >= job.max_attempts:
+            job.status = SnapshotJob.STATUS_FAILED
+        else:
+            delay = min(BACKOFF_BASE_SECONDS * 2 ** (job.attempts - 1), BACKOFF_MAX_SECONDS)
+            job.status = SnapshotJob.STATUS_PENDING
+            job.run_after = timezone.now() + timedelta(seconds=delay)
+        job.locked_at = None
+        job.last_error = str(e)[:2000]
+        try:
+            job.save(update_fields=["status", "run_after", "locked_at", "last_error", "updated_at"])
+        except IntegrityError:
+            # The template was edited meanwhile and already has a fresh pending job.
+            SnapshotJob.objects.filter(pk=job.pk).delete()
+        return False
+
+    job.status = SnapshotJob.STATUS_DONE
+    job.locked_at = None
+    job.last_error = ""
+    job.save(update_fields=["status", "locked_at", "last_error", "updated_at"])
+    return True
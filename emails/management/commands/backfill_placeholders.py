@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from emails.models import EmailTemplate, TemplateCard, TemplatePlaceholder
+from emails.utils import detect_placeholders
+
+
+class Command(BaseCommand):
+    help = "Compute EmailTemplate.placeholders and rebuild the placeholder index for existing rows, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Templates per batch")
+
+    def handle(self, *args, **opts):
+        batch_size = opts["batch_size"]
+        qs = EmailTemplate.objects.only("pk", "body_html", "body_text", "placeholders").order_by("pk")
+        last_pk, total = 0, 0
+        while True:
+            batch = list(qs.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            for tpl in batch:
+                tpl.placeholders = sorted(set(detect_placeholders(tpl.body_html)) | set(detect_placeholders(tpl.body_text)))
+            # bulk_update skips save(): no updated_at bump and no signals, so the cards are refreshed here
+            EmailTemplate.objects.bulk_update(batch, ["placeholders"])
+            pks = [t.pk for t in batch]
+            TemplatePlaceholder.sync(pks, {t.pk: t.placeholders for t in batch})
+            TemplateCard.refresh(pks)
+            last_pk = batch[-1].pk
+            total += len(batch)
+            self.stdout.write(f"  indexed {total} templates (up to #{last_pk})")
+        self.stdout.write(self.style.SUCCESS(f"Backfilled placeholders for {total} templates"))
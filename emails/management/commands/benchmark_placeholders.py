@@ -0,0 +1,56 @@
+import random
+import timeit
+
+from django.core.management.base import BaseCommand
+from emails.utils import CompiledTemplate, detect_placeholders, fill_placeholders
+
+KEYS = ["FIRST_NAME", "LAST_NAME", "EMAIL", "DATE", "FOOTER1", "FOOTER2", "CTA_URL", "UNKNOWN_TAG"]
+
+
+def synthetic_body(size_kb: int, placeholders: int) -> str:
+    rng = random.Random(42)
+    filler = '<tr><td style="padding:8px;font-family:Arial">Lorem ipsum dolor sit amet, consectetur.</td></tr>\n'
+    chunks, total, target = [], 0, size_kb * 1024
+    every = max(1, (target // len(filler)) // max(1, placeholders))
+    i = 0
+    while total < target:
+        chunks.append(filler)
+        total += len(filler)
+        if i % every == 0:
+            chunks.append("<a href=\"{{ %s }}\">{{%s}}</a>\n" % (rng.choice(KEYS), rng.choice(KEYS)))
+        i += 1
+    return "<table>" + "".join(chunks) + "</table>"
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark: regex placeholder fill/detect vs. the compiled segment representation."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size-kb", type=int, default=256, help="Synthetic body size in KB")
+        parser.add_argument("--placeholders", type=int, default=400, help="Approximate placeholder count")
+        parser.add_argument("--repeat", type=int, default=50, help="Iterations per measurement")
+
+    def handle(self, *args, **opts):
+        body = synthetic_body(opts["size_kb"], opts["placeholders"])
+        mapping = {k: f"<value for {k}>" for k in KEYS[:-1]}
+        n = opts["repeat"]
+
+        compiled = CompiledTemplate(body)
+        assert compiled.fill(mapping) == fill_placeholders(body, mapping)
+        assert compiled.placeholders == detect_placeholders(body)
+
+        def per_call(fn):
+            return min(timeit.repeat(fn, number=n, repeat=3)) / n * 1e6
+
+        rows = [
+            ("regex fill (fill_placeholders)", per_call(lambda: fill_placeholders(body, mapping))),
+            ("compiled fill (warm cache)", per_call(lambda: compiled.fill(mapping))),
+            ("regex detect (detect_placeholders)", per_call(lambda: detect_placeholders(body))),
+            ("compiled detect (warm cache)", per_call(lambda: compiled.placeholders)),
+            ("compile once (cold cache)", per_call(lambda: CompiledTemplate(body))),
+        ]
+        self.stdout.write(f"Body: {len(body) / 1024:.0f} KB, {len(compiled.slots)} placeholder tokens, {n} iterations")
+        for label, us in rows:
+            self.stdout.write(f"  {label:<38} {us:>10.1f} µs/op")
+        speedup = rows[0][1] / rows[1][1] if rows[1][1] else float("inf")
+        self.stdout.write(self.style.SUCCESS(f"Compiled fill is {speedup:.1f}x faster than the regex path"))
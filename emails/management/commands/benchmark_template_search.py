@@ -0,0 +1,94 @@
+import random
+import statistics
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from emails.models import EmailTemplate
+from emails.search import full_text_enabled, search_templates, update_search_vector
+
+WORDS = (
+    "spring sale summer launch welcome onboarding newsletter invoice receipt webinar holiday black friday "
+    "discount offer exclusive update reminder survey feedback product release weekly digest renewal trial"
+).split()
+QUERIES = ["welcome", "black friday", "weekly digest", "renewal reminder", "webinar", "survey feedback"]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark gallery search (icontains scan vs. ranked full-text) over a synthetic template set."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000, help="Synthetic templates to insert")
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per query")
+        parser.add_argument("--keep", action="store_true", help="Keep the synthetic rows instead of rolling back")
+
+    def handle(self, *args, **opts):
+        if not full_text_enabled():
+            self.stdout.write(self.style.WARNING(
+                f"{connection.vendor} has no full-text index; only the icontains fallback is measured."
+            ))
+        try:
+            with transaction.atomic():
+                self._run(opts)
+                if not opts["keep"]:
+                    raise _Rollback
+        except _Rollback:
+            self.stdout.write("Synthetic rows rolled back.")
+
+    def _run(self, opts):
+        rng = random.Random(42)
+        owner, _ = get_user_model().objects.get_or_create(username="search-benchmark")
+        started = time.monotonic()
+        batch = []
+        for i in range(opts["rows"]):
+            words = rng.sample(WORDS, 6)
+            batch.append(EmailTemplate(
+                owner=owner,
+                template_id=uuid.uuid4().hex[:8].upper(),
+                title=" ".join(words[:3]).title(),
+                subject=" ".join(words[2:5]),
+                from_name=rng.choice(["Acme", "Globex", "Initech", "Umbrella"]),
+                body_html="<p>" + " ".join(rng.choices(WORDS, k=60)) + "</p>",
+                body_text=" ".join(rng.choices(WORDS, k=60)),
+                is_public=True,
+            ))
+            if len(batch) >= 5000:
+                EmailTemplate.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            EmailTemplate.objects.bulk_create(batch)
+        update_search_vector(EmailTemplate.objects.filter(owner=owner))
+        if full_text_enabled():
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE emails_emailtemplate")
+        self.stdout.write(f"Inserted {opts['rows']} templates in {time.monotonic() - started:.1f}s")
+
+        base = EmailTemplate.objects.filter(is_public=True)
+
+        def scan(q):
+            return base.filter(
+                Q(title__icontains=q) | Q(subject__icontains=q) | Q(from_name__icontains=q) | Q(template_id__icontains=q)
+            ).order_by("-updated_at")
+
+        def ranked(q):
+            return search_templates(base, q)[0]
+
+        runs = [("icontains scan", scan)]
+        if full_text_enabled():
+            runs.append(("full-text ranked", ranked))
+        for label, build in runs:
+            timings = []
+            for q in QUERIES:
+                for _ in range(opts["repeat"]):
+                    t0 = time.monotonic()
+                    list(build(q).values_list("pk", flat=True)[:9])   # one gallery page
+                    timings.append((time.monotonic() - t0) * 1000)
+            p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+            self.stdout.write(f"  {label:<18} p50 {statistics.median(timings):8.2f} ms   p95 {p95:8.2f} ms")
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from emails.usage import flush_usage, write_behind_enabled
+
+
+class Command(BaseCommand):
+    help = "Write buffered TemplateUsage increments from the cache to the database in bulk."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=1000, help="Log entries read per round")
+        parser.add_argument("--interval", type=float, default=0,
+                            help="Keep running, flushing every N seconds (0 = flush once and exit)")
+
+    def handle(self, *args, **opts):
+        if not write_behind_enabled():
+            self.stdout.write("TEMPLATE_USAGE_WRITE_BEHIND is off; usage is written directly, nothing to flush.")
+            return
+        try:
+            while True:
+                close_old_connections()
+                pairs, uses, events = flush_usage(batch_size=opts["batch"])
+                if pairs or events or not opts["interval"]:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"Flushed {uses} uses across {pairs} user/template pairs, {events} usage events"
+                    ))
+                if not opts["interval"]:
+                    break
+                time.sleep(opts["interval"])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from emails.jobs import store_derivatives
+from emails.models import EmailTemplate
+
+
+class Command(BaseCommand):
+    help = "Backfill WebP/PNG snapshot derivatives (thumb, card, full) for existing templates."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--refresh", action="store_true", help="Rebuild even if derivatives exist")
+        parser.add_argument("--chunk-size", type=int, default=200, help="Rows fetched per database round trip")
+
+    def handle(self, *args, **opts):
+        qs = EmailTemplate.objects.exclude(Q(snapshot="") | Q(snapshot__isnull=True))
+        if not opts["refresh"]:
+            qs = qs.filter(snapshot_variants={})
+        rows = qs.only("pk", "snapshot", "snapshot_digest").order_by("pk").iterator(chunk_size=opts["chunk_size"])
+
+        seen, done, failed = set(), 0, 0
+        for tpl in rows:
+            # Identical bodies share one image; each image only needs one set of derivatives.
+            if tpl.snapshot.name in seen:
+                continue
+            seen.add(tpl.snapshot.name)
+            try:
+                store_derivatives(tpl)
+                done += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"Template #{tpl.pk} ({tpl.snapshot.name}) failed: {e}")
+        self.stdout.write(self.style.SUCCESS(f"Built derivatives for {done} snapshot images ({failed} failed)"))
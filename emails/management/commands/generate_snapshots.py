@@ -1,22 +1,158 @@
-from django.core.management.base import BaseCommand
+import json
+import statistics
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from django.conf import settings
 from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, Q
+from django.utils.dateparse import parse_date, parse_datetime
+from emails.jobs import link_shared_snapshot, store_snapshot
 from emails.models import EmailTemplate
-from emails.snapshot import render_html_to_snapshot_content
+from emails.snapshot import SnapshotRenderer, render, renderer_options
+
+# Outside the source tree; a deploy must not ship or wipe it
+DEFAULT_CHECKPOINT = getattr(
+    settings, "SNAPSHOT_CHECKPOINT", Path(tempfile.gettempdir()) / "generate_snapshots.checkpoint"
+)
+
 
 class Command(BaseCommand):
-    help = "Generate/refresh snapshots for all EmailTemplate records."
+    help = "Generate/refresh snapshots for EmailTemplate records (concurrent and resumable)."
 
     def add_arguments(self, parser):
         parser.add_argument("--refresh", action="store_true", help="Regenerate even if a snapshot exists")
+        parser.add_argument("--concurrency", type=int, default=1, help="Parallel pages/browsers to render on")
+        parser.add_argument("--chunk-size", type=int, default=200, help="Rows fetched per database round trip")
+        parser.add_argument("--since", help="Only templates updated at/after this date or datetime (ISO 8601)")
+        parser.add_argument("--ids", help="Comma-separated template primary keys")
+        parser.add_argument("--owner", help="Only templates owned by this username (or user id)")
+        parser.add_argument("--resume", action="store_true", help="Continue after the last checkpointed template")
+        parser.add_argument("--checkpoint", default=str(DEFAULT_CHECKPOINT), help="Checkpoint file path")
 
     def handle(self, *args, **opts):
-        refresh = opts["refresh"]
+        concurrency = max(1, opts["concurrency"])
+        checkpoint = Path(opts["checkpoint"])
+        qs = self._filtered_queryset(opts)
+
+        start_after = 0
+        if opts["resume"] and checkpoint.exists():
+            start_after = json.loads(checkpoint.read_text()).get("last_pk", 0)
+            self.stdout.write(f"Resuming after template #{start_after}")
+        qs = qs.filter(pk__gt=start_after).order_by("pk")
+
+        # Only the columns needed to render and store; keep memory flat with a chunked cursor.
+        rows = qs.only("pk", "body_html", "snapshot", "body_digest", "snapshot_digest", "snapshot_variants").iterator(
+            chunk_size=opts["chunk_size"]
+        )
+
+        renderer = SnapshotRenderer(
+            pool_size=concurrency,
+            recycle_after=getattr(settings, "SNAPSHOT_RECYCLE_AFTER", 200),
+            render_timeout=getattr(settings, "SNAPSHOT_RENDER_TIMEOUT", 15.0),
+            **renderer_options(),
+        )
+        timings, failed, linked = [], 0, 0
+        rendered = {}          # digest -> (storage name, variants) rendered by this run
+        in_flight = {}         # digest -> templates waiting for the render already queued for it
+        order = deque()        # pks in submission order, for a gap-free checkpoint
+        finished = set()
+        last_pk = start_after
+        started = time.monotonic()
+
+        def _render(tpl):
+            t0 = time.monotonic()
+            png = render(tpl.body_html or "", renderer=renderer)
+            return tpl, png, (time.monotonic() - t0) * 1000
+
+        def _collect(futures):
+            nonlocal failed, linked, last_pk
+            for fut in futures:
+                pk, digest = pending.pop(fut)
+                waiting = in_flight.pop(digest, [])
+                try:
+                    tpl, png, ms = fut.result()
+                    store_snapshot(tpl, ContentFile(png), digest)
+                    timings.append(ms)
+                    rendered[digest] = (tpl.snapshot.name, tpl.snapshot_variants)
+                    for other in waiting:
+                        link_shared_snapshot(other, digest, rendered[digest])
+                    linked += len(waiting)
+                except Exception as e:
+                    failed += 1 + len(waiting)
+                    self.stderr.write(f"Template #{pk} failed: {e}")
+                    if waiting:
+                        self.stderr.write(f"  and {len(waiting)} more with the same body")
+                finished.add(pk)
+            advanced = False
+            while order and order[0] in finished:
+                last_pk = order.popleft()
+                finished.discard(last_pk)
+                advanced = True
+            if advanced:
+                checkpoint.write_text(json.dumps({"last_pk": last_pk}))
+
+        pending = {}
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                for tpl in rows:
+                    digest = tpl.body_digest
+                    # Identical bodies share one image: link instead of rendering again. With --refresh
+                    # only images rendered by this run count, never the ones being replaced.
+                    if digest in in_flight:
+                        in_flight[digest].append(tpl)
+                        continue
+                    shared = rendered.get(digest)
+                    if (shared or not opts["refresh"]) and link_shared_snapshot(tpl, digest, shared):
+                        linked += 1
+                        continue
+                    in_flight[digest] = []
+                    order.append(tpl.pk)
+                    pending[pool.submit(_render, tpl)] = (tpl.pk, digest)
+                    if len(pending) >= concurrency * 2:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        _collect(done)
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    _collect(done)
+        finally:
+            renderer.close()
+
+        # A completed run needs no checkpoint; a crash leaves it behind for --resume.
+        if checkpoint.exists():
+            checkpoint.unlink()
+        self._report(len(timings), failed, time.monotonic() - started, timings)
+        if linked:
+            self.stdout.write(f"Linked {linked} templates to identical snapshots")
+
+    def _filtered_queryset(self, opts):
         qs = EmailTemplate.objects.all()
-        count = qs.count()
-        done = 0
-        for tpl in qs:
-            if refresh or not tpl.snapshot:
-                content: ContentFile = render_html_to_snapshot_content(tpl.body_html or "")
-                tpl.snapshot.save(f"template_{tpl.pk}.png", content, save=True)
-                done += 1
-        self.stdout.write(self.style.SUCCESS(f"Processed {done}/{count} templates"))
+        if not opts["refresh"]:
+            qs = qs.filter(Q(snapshot="") | Q(snapshot__isnull=True) | ~Q(snapshot_digest=F("body_digest")))
+        if opts["since"]:
+            since = parse_datetime(opts["since"]) or parse_date(opts["since"])
+            if since is None:
+                raise CommandError(f"Invalid --since value: {opts['since']}")
+            qs = qs.filter(updated_at__gte=since)
+        if opts["ids"]:
+            try:
+                ids = [int(i) for i in opts["ids"].split(",") if i.strip()]
+            except ValueError:
+                raise CommandError("--ids must be a comma-separated list of integers")
+            qs = qs.filter(pk__in=ids)
+        if opts["owner"]:
+            owner = opts["owner"]
+            qs = qs.filter(owner_id=int(owner)) if owner.isdigit() else qs.filter(owner__username=owner)
+        return qs
+
+    def _report(self, done, failed, elapsed, timings):
+        rate = done / elapsed if elapsed else 0.0
+        self.stdout.write(self.style.SUCCESS(f"Processed {done} templates ({failed} failed) in {elapsed:.1f}s"))
+        if timings:
+            p50 = statistics.median(timings)
+            p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+            self.stdout.write(f"Throughput: {rate:.2f} templates/sec, render p50 {p50:.0f} ms, p95 {p95:.0f} ms")
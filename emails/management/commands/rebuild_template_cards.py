@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+from emails.models import EmailTemplate, TemplateCard
+
+
+class Command(BaseCommand):
+    help = "Rebuild the TemplateCard read model from EmailTemplate (and recount usage totals)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500, help="Templates copied per upsert")
+
+    def handle(self, *args, **opts):
+        started = time.monotonic()
+        size = opts["chunk_size"]
+        ids = list(EmailTemplate.objects.order_by("pk").values_list("pk", flat=True))
+        copied = 0
+        for i in range(0, len(ids), size):
+            copied += TemplateCard.refresh(ids[i:i + size])
+        # Cards whose template vanished without a delete signal (e.g. raw SQL)
+        orphans, _ = TemplateCard.objects.exclude(pk__in=EmailTemplate.objects.values("pk")).delete()
+        TemplateCard.recount_uses()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {copied} cards, removed {orphans} orphans in {time.monotonic() - started:.1f}s"
+        ))
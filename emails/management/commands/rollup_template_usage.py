@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from emails.analytics import rollup_new_events
+
+
+class Command(BaseCommand):
+    help = "Fold new UsageEvent rows into the hourly/daily usage rollups (incremental, resumable)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=50000, help="Events folded per transaction")
+        parser.add_argument("--interval", type=float, default=0,
+                            help="Keep running, rolling up every N seconds (0 = run once and exit)")
+
+    def handle(self, *args, **opts):
+        try:
+            while True:
+                close_old_connections()
+                started = time.monotonic()
+                processed = rollup_new_events(batch_size=opts["batch"])
+                if processed or not opts["interval"]:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"Rolled up {processed} events in {time.monotonic() - started:.1f}s"
+                    ))
+                if not opts["interval"]:
+                    break
+                time.sleep(opts["interval"])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from emails.jobs import claim_snapshot_jobs, run_snapshot_job
+
+
+class Command(BaseCommand):
+    help = "Claim queued SnapshotJob rows and render them (run one or more of these next to gunicorn)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=5, help="Jobs to claim per poll")
+        parser.add_argument("--sleep", type=float, default=2.0, help="Seconds to wait when the queue is empty")
+        parser.add_argument("--once", action="store_true", help="Drain the queue and exit")
+
+    def handle(self, *args, **opts):
+        batch, sleep, once = opts["batch"], opts["sleep"], opts["once"]
+        done = failed = 0
+        self.stdout.write("Snapshot worker started.")
+        try:
+            while True:
+                close_old_connections()
+                jobs = claim_snapshot_jobs(limit=batch)
+                if not jobs:
+                    if once:
+                        break
+                    time.sleep(sleep)
+                    continue
+                for job in jobs:
+                    if run_snapshot_job(job):
+                        done += 1
+                    else:
+                        failed += 1
+                        self.stderr.write(f"Job {job.pk} (template {job.template_id}) failed: {job.last_error}")
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Snapshot worker stopped: {done} done, {failed} failed"))
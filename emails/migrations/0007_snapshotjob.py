@@ -0,0 +1,38 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:23
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emails', '0006_alter_templateusage_used_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=5)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshot_jobs', to='emails.emailtemplate')),
+            ],
+            options={
+                'ordering': ['run_after'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='emails_snap_status_34eefb_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='snapshotjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('template',), name='unique_pending_snapshot_job'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:25
+
+from django.db import migrations, models
+
+
+def backfill_digests(apps, schema_editor):
+    # Existing snapshots are assumed current for their body, so nothing is re-rendered.
+    from emails.snapshot import snapshot_digest
+
+    EmailTemplate = apps.get_model("emails", "EmailTemplate")
+    batch = []
+    for tpl in EmailTemplate.objects.only("pk", "body_html", "snapshot").iterator(chunk_size=500):
+        tpl.body_digest = snapshot_digest(tpl.body_html)
+        tpl.snapshot_digest = tpl.body_digest if tpl.snapshot else ""
+        batch.append(tpl)
+        if len(batch) >= 500:
+            EmailTemplate.objects.bulk_update(batch, ["body_digest", "snapshot_digest"])
+            batch = []
+    if batch:
+        EmailTemplate.objects.bulk_update(batch, ["body_digest", "snapshot_digest"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emails', '0007_snapshotjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailtemplate',
+            name='body_digest',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='emailtemplate',
+            name='snapshot_digest',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64),
+        ),
+        migrations.RunPython(backfill_digests, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emails', '0008_snapshot_digests'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailtemplate',
+            name='snapshot_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
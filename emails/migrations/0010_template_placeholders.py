@@ -0,0 +1,31 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emails', '0009_emailtemplate_snapshot_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailtemplate',
+            name='placeholders',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.CreateModel(
+            name='TemplatePlaceholder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='placeholder_index', to='emails.emailtemplate')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['name', 'template'], name='emails_temp_name_40d8c2_idx')],
+                'unique_together': {('template', 'name')},
+            },
+        ),
+    ]
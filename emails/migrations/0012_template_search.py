@@ -0,0 +1,50 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:52
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# GIN / trigram indexes and the vector backfill only exist on PostgreSQL. They are kept
+# out of the model state on purpose, so SQLite table rebuilds never try to recreate them.
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    from django.contrib.postgres.search import SearchVector
+
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS emails_tpl_search_gin ON emails_emailtemplate USING gin (search_vector)"
+    )
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS emails_tpl_id_trgm ON emails_emailtemplate USING gin (template_id gin_trgm_ops)"
+    )
+    EmailTemplate = apps.get_model("emails", "EmailTemplate")
+    EmailTemplate.objects.update(
+        search_vector=SearchVector("title", weight="A", config="english")
+        + SearchVector("subject", weight="B", config="english")
+        + SearchVector("from_name", weight="C", config="english")
+        + SearchVector("body_text", weight="D", config="english")
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS emails_tpl_search_gin")
+    schema_editor.execute("DROP INDEX IF EXISTS emails_tpl_id_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emails', '0011_usage_analytics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailtemplate',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
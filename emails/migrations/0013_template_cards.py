@@ -0,0 +1,67 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_cards(apps, schema_editor):
+    from django.db.models import Sum
+
+    EmailTemplate = apps.get_model("emails", "EmailTemplate")
+    TemplateCard = apps.get_model("emails", "TemplateCard")
+    TemplateUsage = apps.get_model("emails", "TemplateUsage")
+    totals = dict(
+        TemplateUsage.objects.order_by().values("template_id").annotate(n=Sum("used_count")).values_list("template_id", "n")
+    )
+    batch = []
+    qs = EmailTemplate.objects.select_related("owner").defer("body_html", "body_text", "search_vector")
+    for tpl in qs.iterator(chunk_size=500):
+        snapshot = tpl.snapshot
+        batch.append(TemplateCard(
+            id=tpl.pk, owner_id=tpl.owner_id, owner_username=tpl.owner.username, template_id=tpl.template_id,
+            title=tpl.title, subject=tpl.subject, from_name=tpl.from_name, is_public=tpl.is_public,
+            snapshot=snapshot.url if snapshot else "",
+            snapshot_variant_urls={k: snapshot.storage.url(v) for k, v in (tpl.snapshot_variants or {}).items()},
+            placeholders=tpl.placeholders, uses_total=totals.get(tpl.pk, 0),
+            created_at=tpl.created_at, updated_at=tpl.updated_at,
+        ))
+        if len(batch) >= 500:
+            TemplateCard.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        TemplateCard.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emails', '0012_template_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TemplateCard',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('owner_username', models.CharField(max_length=150)),
+                ('template_id', models.CharField(db_index=True, max_length=12)),
+                ('title', models.CharField(max_length=200)),
+                ('subject', models.CharField(blank=True, max_length=200)),
+                ('from_name', models.CharField(blank=True, max_length=100)),
+                ('is_public', models.BooleanField(default=False)),
+                ('snapshot', models.CharField(blank=True, max_length=500)),
+                ('snapshot_variant_urls', models.JSONField(blank=True, default=dict)),
+                ('placeholders', models.JSONField(blank=True, default=list)),
+                ('uses_total', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['is_public', '-updated_at', '-id'], name='emails_temp_is_publ_256b8e_idx'), models.Index(fields=['owner', '-updated_at', '-id'], name='emails_temp_owner_i_8d4f2b_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_cards, migrations.RunPython.noop),
+    ]
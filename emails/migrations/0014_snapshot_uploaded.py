@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:08
+
+from pathlib import PurePosixPath
+
+from django.db import migrations, models
+
+
+def flag_uploaded_snapshots(apps, schema_editor):
+    # Rendered snapshots are stored as <digest>.png; any other file name was uploaded by hand
+    EmailTemplate = apps.get_model("emails", "EmailTemplate")
+    uploaded = [
+        pk
+        for pk, name, digest in EmailTemplate.objects.exclude(snapshot="").exclude(snapshot__isnull=True)
+        .values_list("pk", "snapshot", "snapshot_digest").iterator(chunk_size=2000)
+        if not digest or not PurePosixPath(name).stem.startswith(digest)
+    ]
+    for start in range(0, len(uploaded), 2000):
+        EmailTemplate.objects.filter(pk__in=uploaded[start:start + 2000]).update(snapshot_uploaded=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emails', '0013_template_cards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailtemplate',
+            name='snapshot_uploaded',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(flag_uploaded_snapshots, migrations.RunPython.noop),
+    ]
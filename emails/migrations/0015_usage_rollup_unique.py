@@ -0,0 +1,49 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:09
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_rollups(apps, schema_editor):
+    # The old update-then-create fold could race into duplicate rows; sum each key into one row
+    for name in ("UsageHourly", "UsageDaily"):
+        model = apps.get_model("emails", name)
+        keys = ("bucket", "template_id", "platform_id", "network_id")
+        dupes = (
+            model.objects.values(*keys)
+            .annotate(rows=Count("id"), total=Sum("uses"), keep=Min("id"))
+            .filter(rows__gt=1)
+            .order_by()
+        )
+        for d in dupes:
+            model.objects.filter(**{k: d[k] for k in keys}).exclude(pk=d["keep"]).delete()
+            model.objects.filter(pk=d["keep"]).update(uses=d["total"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0010_offer_import_job_applied'),
+        ('emails', '0014_snapshot_uploaded'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_rollups, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='usagedaily',
+            name='emails_usag_bucket_4af8dc_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='usagehourly',
+            name='emails_usag_bucket_fac08e_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='usagedaily',
+            constraint=models.UniqueConstraint(models.F('bucket'), models.F('template'), django.db.models.functions.comparison.Coalesce('platform', 0), django.db.models.functions.comparison.Coalesce('network', 0), name='unique_usage_daily'),
+        ),
+        migrations.AddConstraint(
+            model_name='usagehourly',
+            constraint=models.UniqueConstraint(models.F('bucket'), models.F('template'), django.db.models.functions.comparison.Coalesce('platform', 0), django.db.models.functions.comparison.Coalesce('network', 0), name='unique_usage_hourly'),
+        ),
+    ]
@@ -1,7 +1,13 @@
 
 from django.db import models
+from django.db.models.functions import Coalesce
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from catalog.models import Platform
+from .page_cache import bump_gallery_generation
+from .snapshot import snapshot_digest
+from .utils import detect_placeholders
 import uuid
 User = get_user_model()
 
@@ -25,6 +31,18 @@ class EmailTemplate(models.Model):
         null=True, blank=True,
         help_text="Upload a thumbnail/preview image for the template."
     )
+    # Digest of the current body vs. the body the stored snapshot was rendered from
+    body_digest = models.CharField(max_length=64, blank=True, editable=False)
+    snapshot_digest = models.CharField(max_length=64, blank=True, editable=False, db_index=True)
+    # Hand-uploaded images stand in for this template's render only; they are never shared by digest
+    snapshot_uploaded = models.BooleanField(default=False, editable=False)
+    # Resized WebP/PNG copies of the snapshot, e.g. {"card.webp": "snapshots/<digest>-card.webp"}
+    snapshot_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # Sorted {{placeholder}} names found in body_html + body_text, computed on save
+    placeholders = models.JSONField(default=list, blank=True, editable=False)
+    # Weighted tsvector over title/subject/from_name/body_text, maintained on PostgreSQL only (see emails.search).
+    # Its GIN index and the template_id trigram index are created by migration 0012, also PostgreSQL only.
+    search_vector = SearchVectorField(null=True, editable=False)
    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -33,11 +51,151 @@ class EmailTemplate(models.Model):
         if not self.template_id:
             # Generate short unique ID (first 8 chars of UUID4, can be tuned)
             self.template_id = uuid.uuid4().hex[:8].upper()
+        self.body_digest = snapshot_digest(self.body_html)
+        placeholders = sorted(set(detect_placeholders(self.body_html)) | set(detect_placeholders(self.body_text)))
+        # Read by the post_save signal to decide whether the TemplatePlaceholder index needs syncing
+        self._placeholders_changed = self._state.adding or placeholders != self.placeholders
+        self.placeholders = placeholders
+        if self.snapshot and not self.snapshot._committed:
+            # A hand-uploaded image counts as the snapshot of the current body
+            self.snapshot_digest = self.body_digest
+            self.snapshot_uploaded = True
+            self.snapshot_variants = {}
         super().save(*args, **kwargs)
 
+    @property
+    def needs_snapshot(self) -> bool:
+        """True when there is no snapshot or it was rendered from a different body."""
+        return not self.snapshot or self.snapshot_digest != self.body_digest
+
+    @property
+    def needs_derivatives(self) -> bool:
+        """True when a snapshot exists but its resized copies were never generated."""
+        return bool(self.snapshot) and not self.snapshot_variants
+
     def __str__(self):
         return f"{self.title} ({self.template_id})"
         
+class TemplateCard(models.Model):
+    """
+    Slim, denormalised copy of what a gallery/list card shows (no bodies).
+    `id` mirrors EmailTemplate.pk; rows are kept in sync by emails.signals and TemplateCard.refresh().
+    Every card write bumps the public gallery generation, which invalidates the anonymous page cache.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    owner_username = models.CharField(max_length=150)
+    template_id = models.CharField(max_length=12, db_index=True)
+    title = models.CharField(max_length=200)
+    subject = models.CharField(max_length=200, blank=True)
+    from_name = models.CharField(max_length=100, blank=True)
+    is_public = models.BooleanField(default=False)
+    # Resolved URLs, so rendering a card never touches storage: original + {"card.webp": url, ...}
+    snapshot = models.CharField(max_length=500, blank=True)
+    snapshot_variant_urls = models.JSONField(default=dict, blank=True)
+    placeholders = models.JSONField(default=list, blank=True)
+    uses_total = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    CARD_FIELDS = (
+        "owner", "owner_username", "template_id", "title", "subject", "from_name", "is_public",
+        "snapshot", "snapshot_variant_urls", "placeholders", "created_at", "updated_at",
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["is_public", "-updated_at", "-id"]),
+            models.Index(fields=["owner", "-updated_at", "-id"]),
+        ]
+
+    def __str__(self):
+        return f"Card for {self.template_id}"
+
+    @classmethod
+    def from_template(cls, tpl):
+        snapshot = tpl.snapshot
+        return cls(
+            id=tpl.pk,
+            owner_id=tpl.owner_id,
+            owner_username=tpl.owner.username,
+            template_id=tpl.template_id,
+            title=tpl.title,
+            subject=tpl.subject,
+            from_name=tpl.from_name,
+            is_public=tpl.is_public,
+            snapshot=snapshot.url if snapshot else "",
+            snapshot_variant_urls={k: snapshot.storage.url(v) for k, v in (tpl.snapshot_variants or {}).items()},
+            placeholders=tpl.placeholders,
+            created_at=tpl.created_at,
+            updated_at=tpl.updated_at,
+        )
+
+    @classmethod
+    def sync(cls, tpl):
+        """Upsert the card for one freshly saved template (no extra read)."""
+        cls.objects.bulk_create(
+            [cls.from_template(tpl)], update_conflicts=True, unique_fields=["id"], update_fields=list(cls.CARD_FIELDS)
+        )
+        bump_gallery_generation()
+
+    @classmethod
+    def recount_uses(cls, template_ids=None):
+        """Recompute uses_total from TemplateUsage (the write path keeps it current incrementally)."""
+        totals = (
+            TemplateUsage.objects.filter(template_id=models.OuterRef("pk"))
+            .order_by().values("template_id").annotate(total=models.Sum("used_count")).values("total")
+        )
+        qs = cls.objects.all() if template_ids is None else cls.objects.filter(pk__in=template_ids)
+        return qs.update(uses_total=Coalesce(models.Subquery(totals), 0))
+
+    @classmethod
+    def refresh(cls, template_ids):
+        """Re-copy these templates into their cards in one upsert; cards of deleted templates are dropped."""
+        template_ids = list(template_ids)
+        templates = EmailTemplate.objects.filter(pk__in=template_ids).select_related("owner").defer(
+            "body_html", "body_text", "search_vector"
+        )
+        cards = [cls.from_template(tpl) for tpl in templates]
+        cls.objects.bulk_create(
+            cards, update_conflicts=True, unique_fields=["id"], update_fields=list(cls.CARD_FIELDS), batch_size=500
+        )
+        cls.objects.filter(pk__in=set(template_ids) - {c.pk for c in cards}).delete()
+        bump_gallery_generation()
+        return len(cards)
+
+
+class TemplatePlaceholder(models.Model):
+    """Inverted index: placeholder name -> templates that use it."""
+    template = models.ForeignKey(
+        EmailTemplate,
+        on_delete=models.CASCADE,
+        related_name="placeholder_index"
+    )
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        unique_together = ("template", "name")
+        indexes = [
+            models.Index(fields=["name", "template"]),
+        ]
+
+    def __str__(self):
+        return f"{{{{{self.name}}}}} in {self.template_id}"
+
+    @classmethod
+    def sync(cls, template_ids, placeholders_by_template):
+        """Replace the index rows of the given templates with their current placeholder lists."""
+        cls.objects.filter(template_id__in=template_ids).delete()
+        cls.objects.bulk_create(
+            [
+                cls(template_id=pk, name=name)
+                for pk in template_ids
+                for name in placeholders_by_template.get(pk, [])
+            ],
+            ignore_conflicts=True,
+        )
+
 class TemplateUsage(models.Model):
     template = models.ForeignKey(
         EmailTemplate,
@@ -56,9 +214,124 @@ class TemplateUsage(models.Model):
         unique_together = ("template", "user")
         ordering = ["-last_used_at"]
 
-    def increment_usage(self):
-        self.used_count += 1
-        self.save(update_fields=["used_count", "last_used_at"])
+    def __str__(self):
+        return f"{self.user} used {self.template} ({self.used_count}x)"
+
+
+class UsageEvent(models.Model):
+    """Append-only record of a single template use; written in batches by emails.usage."""
+    id = models.BigAutoField(primary_key=True)
+    template = models.ForeignKey(EmailTemplate, on_delete=models.CASCADE, related_name="usage_events")
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    # Analytics keep their dimensions even after the catalog row is gone, hence no FK constraint
+    platform = models.ForeignKey(
+        Platform, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name="+"
+    )
+    offer_link = models.ForeignKey(
+        "catalog.OfferLink", on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name="+"
+    )
+    occurred_at = models.DateTimeField()
+    recorded_at = models.DateTimeField(auto_now_add=True)
+    count = models.PositiveIntegerField(default=1)
+
+    def __str__(self):
+        return f"Template {self.template_id} used x{self.count} at {self.occurred_at}"
+
+
+class UsageRollup(models.Model):
+    """Uses per bucket and template, split by platform and offer network. Built by `rollup_template_usage`."""
+    template = models.ForeignKey(EmailTemplate, on_delete=models.CASCADE, related_name="+")
+    platform = models.ForeignKey(
+        Platform, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name="+"
+    )
+    network = models.ForeignKey(
+        "catalog.OfferNetwork", on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True,
+        related_name="+"
+    )
+    uses = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+def _rollup_key(name):
+    # One row per (bucket, template, platform, network); NULL dimensions compare equal through COALESCE.
+    # Also the (bucket, template) index the leaderboard reads through. emails.analytics targets it in ON CONFLICT.
+    return models.UniqueConstraint(
+        "bucket", "template",
+        Coalesce("platform", 0),
+        Coalesce("network", 0),
+        name=name,
+    )
+
+
+class UsageHourly(UsageRollup):
+    bucket = models.DateTimeField()
+
+    class Meta:
+        constraints = [_rollup_key("unique_usage_hourly")]
+        verbose_name_plural = "Usage (hourly)"
+
+
+class UsageDaily(UsageRollup):
+    bucket = models.DateField()
+
+    class Meta:
+        constraints = [_rollup_key("unique_usage_daily")]
+        verbose_name_plural = "Usage (daily)"
+
+
+class RollupCursor(models.Model):
+    """Highest UsageEvent id already folded into the rollups, advanced in the same transaction."""
+    name = models.CharField(max_length=50, unique=True)
+    last_event_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"{self.user} used {self.template} ({self.used_count}x)"
\ No newline at end of file
+        return f"{self.name} @ {self.last_event_id}"
+
+
+class SnapshotJob(models.Model):
+    """Durable queue entry for rendering an EmailTemplate snapshot off the request path."""
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    template = models.ForeignKey(
+        EmailTemplate,
+        on_delete=models.CASCADE,
+        related_name="snapshot_jobs"
+    )
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["run_after"]
+        indexes = [
+            models.Index(fields=["status", "run_after"]),
+        ]
+        constraints = [
+            # At most one queued job per template; re-saves just reschedule it.
+            models.UniqueConstraint(
+                fields=["template"],
+                condition=models.Q(status="pending"),
+                name="unique_pending_snapshot_job",
+            )
+        ]
+
+    def __str__(self):
+        return f"Snapshot job for {self.template_id} ({self.status})"
+
@@ -0,0 +1,101 @@
+# Full-page cache for anonymous gallery requests, invalidated by a global "public gallery generation".
+import hashlib
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+GENERATION_KEY = "gallery:generation"
+STALE_SECONDS = 300      # how long an outdated copy may still be served while one request rebuilds it
+LOCK_SECONDS = 30
+COLD_WAIT_SECONDS = 0.5  # a cold miss waits this long for another request's render before rendering itself
+# The only parameters the gallery reads; anything else (utm_*, fbclid, ...) shares the same entry
+PAGE_PARAMS = ("q", "uses", "page", "cursor")
+
+
+def gallery_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Time-based start so an evicted counter never repeats an old generation
+        cache.add(GENERATION_KEY, int(time.time() * 1000), None)
+        generation = cache.get(GENERATION_KEY, 0)
+    return generation
+
+
+def bump_gallery_generation():
+    """Call whenever what the public gallery shows may have changed."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, int(time.time() * 1000), None)
+
+
+def _page_key(request):
+    params = [(k, v.strip()) for k in PAGE_PARAMS for v in request.GET.getlist(k) if v.strip()]
+    digest = hashlib.sha1(urlencode(params).encode()).hexdigest()
+    return f"gallery:page:{request.path}:{digest}"
+
+
+def _replay(entry, state):
+    response = HttpResponse(entry["content"], status=entry["status"], content_type=entry["content_type"])
+    response["X-Gallery-Cache"] = state
+    return response
+
+
+def _cacheable(request):
+    # Flash messages and logged-in users get a personalised page
+    if request.method != "GET" or "messages" in request.COOKIES:
+        return False
+    return not request.user.is_authenticated
+
+
+def anonymous_page_cache(view):
+    """
+    Serve anonymous GETs from the cache while the gallery generation is unchanged.
+    Expired or outdated entries are rebuilt by one request at a time (cache.add lock);
+    everyone else keeps getting the stale copy meanwhile, so expiry never stampedes the DB.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        ttl = getattr(settings, "GALLERY_PAGE_CACHE_SECONDS", 60)
+        if not ttl or not _cacheable(request):
+            return view(request, *args, **kwargs)
+
+        key = _page_key(request)
+        generation = gallery_generation()
+        entry = cache.get(key)
+        if entry and entry["generation"] == generation and entry["expires"] > time.time():
+            return _replay(entry, "HIT")
+
+        lock = f"{key}:lock"
+        if not cache.add(lock, 1, LOCK_SECONDS):
+            if entry:
+                return _replay(entry, "STALE")
+            deadline = time.monotonic() + COLD_WAIT_SECONDS
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                entry = cache.get(key)
+                if entry and entry["generation"] == generation:
+                    return _replay(entry, "HIT")
+            lock = None  # give up waiting and render without the lock
+
+        try:
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.cookies and not response.streaming:
+                cache.set(key, {
+                    "generation": generation,
+                    "expires": time.time() + ttl,
+                    "status": response.status_code,
+                    "content": response.content,
+                    "content_type": response["Content-Type"],
+                }, ttl + STALE_SECONDS)
+            response["X-Gallery-Cache"] = "MISS"
+            return response
+        finally:
+            if lock:
+                cache.delete(lock)
+
+    return wrapper
@@ -0,0 +1,89 @@
+# Keyset (cursor) pagination over (updated_at, id), newest first. No COUNT(*) and no OFFSET.
+import json
+from datetime import datetime
+
+from django.core import signing
+from django.db import connection
+from django.db.models import Q
+
+CURSOR_SALT = "emails.pagination"
+
+
+def encode_cursor(obj, direction):
+    return signing.dumps([obj.updated_at.isoformat(), obj.pk, direction], salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(token):
+    """(updated_at, pk, direction) or None for a missing / tampered / stale token."""
+    if not token:
+        return None
+    try:
+        ts, pk, direction = signing.loads(token, salt=CURSOR_SALT)
+        return datetime.fromisoformat(ts), int(pk), direction if direction in ("next", "prev") else "next"
+    except (signing.BadSignature, ValueError, TypeError):
+        return None
+
+
+def estimate_count(queryset):
+    """Planner row estimate for the queryset on PostgreSQL (cheap, approximate); None elsewhere."""
+    if connection.vendor != "postgresql":
+        return None
+    try:
+        plan = json.loads(queryset.order_by().explain(format="json"))
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except Exception:
+        return None
+
+
+class KeysetPage:
+    """Quacks enough like a Paginator page for the listing templates (iteration, has_next/has_previous)."""
+
+    def __init__(self, object_list, next_token, prev_token, estimated_total=None):
+        self.object_list = object_list
+        self.next_token = next_token
+        self.prev_token = prev_token
+        self.estimated_total = estimated_total
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_token is not None
+
+    def has_previous(self):
+        return self.prev_token is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def keyset_page(queryset, per_page, token=None, estimate=False):
+    cursor = decode_cursor(token)
+    if cursor is None:
+        rows = list(queryset.order_by("-updated_at", "-pk")[:per_page + 1])
+        more, direction = len(rows) > per_page, "next"
+    else:
+        ts, pk, direction = cursor
+        if direction == "next":
+            qs = queryset.filter(Q(updated_at__lt=ts) | Q(updated_at=ts, pk__lt=pk)).order_by("-updated_at", "-pk")
+        else:
+            qs = queryset.filter(Q(updated_at__gt=ts) | Q(updated_at=ts, pk__gt=pk)).order_by("updated_at", "pk")
+        rows = list(qs[:per_page + 1])
+        more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == "prev":
+        rows.reverse()
+
+    if direction == "next":
+        has_next, has_prev = more, cursor is not None
+    else:
+        has_next, has_prev = True, more
+    return KeysetPage(
+        rows,
+        next_token=encode_cursor(rows[-1], "next") if rows and has_next else None,
+        prev_token=encode_cursor(rows[0], "prev") if rows and has_prev else None,
+        estimated_total=estimate_count(queryset) if estimate else None,
+    )
@@ -0,0 +1,73 @@
+# Template search: ranked full-text search on PostgreSQL, plain icontains everywhere else.
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, OuterRef, Q, Subquery
+
+SEARCH_CONFIG = "english"
+
+# title > subject > from_name > body text
+SEARCH_VECTOR = (
+    SearchVector("title", weight="A", config=SEARCH_CONFIG)
+    + SearchVector("subject", weight="B", config=SEARCH_CONFIG)
+    + SearchVector("from_name", weight="C", config=SEARCH_CONFIG)
+    + SearchVector("body_text", weight="D", config=SEARCH_CONFIG)
+)
+
+
+def full_text_enabled():
+    return connection.vendor == "postgresql"
+
+
+def update_search_vector(queryset):
+    """Recompute search_vector for the given templates in one UPDATE (no-op off PostgreSQL)."""
+    if full_text_enabled():
+        queryset.update(search_vector=SEARCH_VECTOR)
+
+
+def _search_query(q):
+    return SearchQuery(q, search_type="websearch", config=SEARCH_CONFIG)
+
+
+def full_text_q(q):
+    """PostgreSQL only: search vector match, or a partial template_id match."""
+    # template_ids are upper-case hex; a case-sensitive LIKE can use the trigram index
+    return Q(search_vector=_search_query(q)) | Q(template_id__contains=q.upper())
+
+
+def search_templates(queryset, q):
+    """
+    Filter `queryset` by the search box text. Returns (queryset, ranked); ranked
+    querysets are already ordered best match first.
+    """
+    q = (q or "").strip()
+    if not q:
+        return queryset, False
+    if not full_text_enabled():
+        return queryset.filter(
+            Q(title__icontains=q)
+            | Q(subject__icontains=q)
+            | Q(from_name__icontains=q)
+            | Q(template_id__icontains=q)
+        ), False
+
+    qs = queryset.filter(full_text_q(q))
+    return qs.annotate(rank=SearchRank(F("search_vector"), _search_query(q))).order_by("-rank", "-updated_at", "-pk"), True
+
+
+def search_cards(cards, q):
+    """
+    search_templates for TemplateCard querysets. The card shares the searchable
+    column names, so the fallback runs on the card itself; on PostgreSQL the rank
+    comes from the template's search_vector.
+    """
+    if not full_text_enabled() or not (q or "").strip():
+        return search_templates(cards, q)
+    from .models import EmailTemplate
+
+    matches, _ = search_templates(EmailTemplate.objects.all(), q)
+    rank = matches.filter(pk=OuterRef("pk")).values("rank")[:1]
+    return (
+        cards.filter(pk__in=matches.values("pk"))
+        .annotate(rank=Subquery(rank))
+        .order_by("-rank", "-updated_at", "-pk")
+    ), True
@@ -1,58 +1,67 @@
-from django.db.models.signals import post_save, pre_save
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import EmailTemplate
-from .snapshot import render_html_to_snapshot_content
-from django.core.files.base import ContentFile
+from .models import EmailTemplate, TemplateCard, TemplatePlaceholder
+from .jobs import enqueue_snapshot
+from .page_cache import bump_gallery_generation
+from .search import update_search_vector
 
-import os
 import logging
 
-def _needs_snapshot(instance: EmailTemplate, old_html: str | None) -> bool:
-    # Generate if missing OR body changed
-    if not instance.snapshot:
-        return True
-    if old_html is None:
-        return False
-    return (instance.body_html or "").strip() != (old_html or "").strip()
-
-@receiver(pre_save, sender=EmailTemplate)
-def _cache_old_html(sender, instance: EmailTemplate, **kwargs):
-    # Cache previous HTML and snapshot file
-    if instance.pk:
-        try:
-            prev = EmailTemplate.objects.only("body_html", "snapshot").get(pk=instance.pk)
-            instance._old_body_html = prev.body_html
-            instance._old_snapshot = prev.snapshot
-        except EmailTemplate.DoesNotExist:
-            instance._old_body_html = None
-            instance._old_snapshot = None
-    else:
-        instance._old_body_html = None
-        instance._old_snapshot = None
-
 @receiver(post_save, sender=EmailTemplate)
 def generate_snapshot_after_save(sender, instance: EmailTemplate, created, **kwargs):
+    # Change detection is digest-based (see EmailTemplate.save), so no pre-save SELECT is needed.
+    # Only queue the render here; run_snapshot_worker does the actual work.
+    if instance.needs_snapshot or instance.needs_derivatives:
+        # After commit, so a worker never claims a job for a row that is then rolled back
+        transaction.on_commit(partial(_enqueue_snapshot, instance))
+
+
+def _enqueue_snapshot(instance: EmailTemplate):
     try:
-        old_html = getattr(instance, "_old_body_html", None)
-        old_snapshot = getattr(instance, "_old_snapshot", None)
-
-        if _needs_snapshot(instance, old_html):
-            content: ContentFile = render_html_to_snapshot_content(instance.body_html or "")
-            filename = f"template_{instance.pk}.png"
-
-            # Delete old snapshot file if it exists and is different
-            if old_snapshot and old_snapshot != instance.snapshot:
-                try:
-                    if os.path.isfile(old_snapshot.path):
-                        os.remove(old_snapshot.path)
-                    print(f"Deleted old snapshot file: {old_snapshot.path}")
-                except Exception:
-                    logging.getLogger(__name__).warning(
-                        "Failed to delete old snapshot file %s", old_snapshot.path
-                    )
-
-            # Save new snapshot
-            instance.snapshot.save(filename, content, save=True)
+        enqueue_snapshot(instance)
     except Exception as e:
-        # Don’t crash the request if snapshot fails; log it
-        logging.getLogger(__name__).exception("Snapshot generation failed: %s", e)
+        # Don’t crash the request if queueing fails; log it
+        logging.getLogger(__name__).exception("Snapshot enqueue failed: %s", e)
+
+
+@receiver(post_save, sender=EmailTemplate)
+def sync_placeholder_index(sender, instance: EmailTemplate, created, **kwargs):
+    # Only touch the index when the detected placeholder set actually changed (see EmailTemplate.save)
+    if getattr(instance, "_placeholders_changed", False):
+        TemplatePlaceholder.sync([instance.pk], {instance.pk: instance.placeholders})
+        instance._placeholders_changed = False
+
+
+SEARCH_FIELDS = {"title", "subject", "from_name", "body_text"}
+
+
+@receiver(post_save, sender=EmailTemplate)
+def refresh_search_vector(sender, instance: EmailTemplate, update_fields=None, **kwargs):
+    if update_fields is not None and not SEARCH_FIELDS & set(update_fields):
+        return
+    update_search_vector(EmailTemplate.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=EmailTemplate)
+def sync_template_card(sender, instance: EmailTemplate, **kwargs):
+    TemplateCard.sync(instance)
+
+
+@receiver(post_delete, sender=EmailTemplate)
+def delete_template_card(sender, instance: EmailTemplate, **kwargs):
+    TemplateCard.objects.filter(pk=instance.pk).delete()
+    bump_gallery_generation()
+
+
+@receiver(post_save, sender=get_user_model())
+def rename_card_owner(sender, instance, update_fields=None, **kwargs):
+    # Logins save last_login only; skip those
+    if update_fields is not None and "username" not in update_fields:
+        return
+    TemplateCard.objects.filter(owner_id=instance.pk).exclude(owner_username=instance.username).update(
+        owner_username=instance.username
+    )
@@ -1,12 +1,33 @@
 import asyncio
-import tempfile
-from pathlib import Path
+import atexit
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from io import BytesIO
+from urllib.parse import urlsplit
+from django.conf import settings
 from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
 
 # Snapshot defaults
 SNAPSHOT_WIDTH = 800
 SNAPSHOT_HEIGHT = 600
 SNAPSHOT_BG = "#ffffff"  # white background
+# Bump when HTML_WRAPPER or the render pipeline changes so every digest (and snapshot) is refreshed
+SNAPSHOT_RENDER_VERSION = 1
+
+# Resized copies stored next to the original: admin/list thumbnail, gallery card, full preview
+SNAPSHOT_DERIVATIVES = {
+    "thumb": (160, 120),
+    "card": (400, 300),
+    "full": (800, 600),
+}
+SNAPSHOT_DERIVATIVE_FORMATS = ("webp", "png")
 
 HTML_WRAPPER = """<!doctype html>
 <html>
@@ -43,26 +64,332 @@ HTML_WRAPPER = """<!doctype html>
 </html>
 """
 
-async def _render_with_playwright(full_html: str, width: int, height: int) -> bytes:
-    from playwright.async_api import async_playwright
-
-    # Write HTML to a temp file and open with file:// to avoid spinning a server
-    with tempfile.TemporaryDirectory() as tmpdir:
-        html_path = Path(tmpdir) / "preview.html"
-        html_path.write_text(full_html, encoding="utf-8")
-
-        async with async_playwright() as p:
-            browser = await p.chromium.launch()
-            page = await browser.new_page(viewport={"width": width, "height": height, "deviceScaleFactor": 1})
-            await page.goto(html_path.as_uri(), wait_until="load")
-            # Optional: wait a tick for web fonts/images
-            await page.wait_for_timeout(200)
-            png_bytes = await page.screenshot(full_page=False, type="png")
-            await browser.close()
+def snapshot_digest(html: str, width: int = SNAPSHOT_WIDTH, height: int = SNAPSHOT_HEIGHT, bg: str = SNAPSHOT_BG) -> str:
+    """Content hash of the normalized body plus render settings; identical digests share one image."""
+    normalized = (html or "").replace("\r\n", "\n").strip()
+    h = hashlib.sha256(f"v{SNAPSHOT_RENDER_VERSION}|{width}x{height}|{bg}\n".encode())
+    h.update(normalized.encode("utf-8"))
+    return h.hexdigest()
+
+
+def build_derivatives(image_bytes: bytes) -> dict[str, bytes]:
+    """Resize a snapshot into every SNAPSHOT_DERIVATIVES size, as WebP and PNG. Keys look like "card.webp"."""
+    with Image.open(BytesIO(image_bytes)) as src:
+        base = src.convert("RGB")
+    out = {}
+    for size_name, size in SNAPSHOT_DERIVATIVES.items():
+        resized = ImageOps.fit(base, size, method=Image.LANCZOS)
+        for fmt in SNAPSHOT_DERIVATIVE_FORMATS:
+            buf = BytesIO()
+            if fmt == "webp":
+                resized.save(buf, format="WEBP", quality=80, method=4)
+            else:
+                resized.save(buf, format="PNG", optimize=True)
+            out[f"{size_name}.{fmt}"] = buf.getvalue()
+    return out
+
+
+# Request interception: emails only need images, CSS and fonts; everything else is blocked.
+ALLOWED_RESOURCE_TYPES = frozenset({"image", "stylesheet", "font"})
+DEFAULT_BLOCKED_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "facebook.com",
+    "facebook.net",
+    "mixpanel.com",
+    "hotjar.com",
+    "list-manage.com",
+    "mailchimp.com",
+    "sendgrid.net",
+    "hubspot.com",
+)
+# 1x1 transparent GIF served in place of tracking pixels and slow images
+_BLANK_GIF = bytes.fromhex("47494638396101000100800000000000ffffff21f90401000000002c00000000010001000002024401003b")
+
+
+class _AssetCache:
+    """Byte-capped LRU of fetched sub-resources: url -> (content_type, body)."""
+
+    def __init__(self, max_bytes: int, max_item_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self._items = OrderedDict()
+        self._size = 0
+
+    def get(self, url):
+        item = self._items.get(url)
+        if item is not None:
+            self._items.move_to_end(url)
+        return item
+
+    def put(self, url, content_type, body):
+        if len(body) > self.max_item_bytes or url in self._items:
+            return
+        self._items[url] = (content_type, body)
+        self._size += len(body)
+        while self._size > self.max_bytes:
+            _, (_, evicted) = self._items.popitem(last=False)
+            self._size -= len(evicted)
+
+
+def _host_matches(host: str, domains) -> bool:
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+@dataclass
+class _BrowserSlot:
+    """One warm browser + context owned by the renderer loop."""
+    browser: object = None
+    context: object = None
+    renders: int = 0
+    broken: bool = False
+
+
+class SnapshotRenderer:
+    """
+    Long-lived pool of pre-launched Chromium browsers.
+
+    Playwright runs on a dedicated event-loop thread; callers use the
+    blocking :meth:`render` from any thread. Each render borrows a browser
+    slot, opens a fresh page in its warm context and returns the slot to the
+    pool. A browser is relaunched after ``recycle_after`` renders or as soon
+    as a render fails or times out.
+    """
+
+    def __init__(self, pool_size: int = 2, recycle_after: int = 200, render_timeout: float = 15.0,
+                 intercept: bool = True, resource_timeout: float = 3.0, ready_timeout: float = 5.0,
+                 blocked_hosts=DEFAULT_BLOCKED_HOSTS, asset_cache_bytes: int = 64 * 1024 * 1024,
+                 slow_host_cooldown: float = 300.0):
+        self.pool_size = max(1, pool_size)
+        self.recycle_after = max(1, recycle_after)
+        self.render_timeout = render_timeout
+        self.intercept = intercept
+        self.resource_timeout = resource_timeout
+        self.ready_timeout = ready_timeout
+        self.blocked_hosts = tuple(blocked_hosts)
+        self.slow_host_cooldown = slow_host_cooldown
+        self._assets = _AssetCache(asset_cache_bytes, max_item_bytes=5 * 1024 * 1024)
+        self._slow_hosts = {}  # host -> loop time until which it is stubbed
+        self._loop = None
+        self._thread = None
+        self._playwright = None
+        self._slots = None
+        self._start_lock = threading.Lock()
+        self._pid = None
+
+    # ---------- lifecycle ----------
+    def start(self):
+        with self._start_lock:
+            if self._loop is not None and self._pid == os.getpid():
+                return
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="snapshot-renderer", daemon=True)
+            thread.start()
+            self._loop, self._thread, self._pid = loop, thread, os.getpid()
+            try:
+                asyncio.run_coroutine_threadsafe(self._startup(), loop).result()
+            except Exception:
+                self._stop_loop()
+                raise
+
+    def close(self):
+        with self._start_lock:
+            if self._loop is None or self._pid != os.getpid():
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout=30)
+            except Exception:
+                logger.warning("Snapshot renderer did not shut down cleanly", exc_info=True)
+            self._stop_loop()
+
+    def _stop_loop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop = self._thread = self._playwright = self._slots = None
+
+    async def _startup(self):
+        from playwright.async_api import async_playwright
+
+        self._playwright = await async_playwright().start()
+        self._slots = asyncio.Queue()
+        for _ in range(self.pool_size):
+            slot = _BrowserSlot()
+            try:
+                await self._launch(slot)
+            except Exception:
+                # Keep the slot; it is relaunched lazily on first use.
+                logger.exception("Failed to pre-launch snapshot browser")
+            self._slots.put_nowait(slot)
+
+    async def _shutdown(self):
+        while self._slots and not self._slots.empty():
+            await self._discard(self._slots.get_nowait())
+        if self._playwright:
+            await self._playwright.stop()
+
+    # ---------- browser slots ----------
+    async def _launch(self, slot: _BrowserSlot):
+        slot.browser = await self._playwright.chromium.launch(args=["--disable-dev-shm-usage"])
+        slot.context = await slot.browser.new_context(device_scale_factor=1)
+        if self.intercept:
+            await slot.context.route("**/*", self._route)
+        slot.renders = 0
+        slot.broken = False
+
+    async def _discard(self, slot: _BrowserSlot):
+        browser, slot.browser, slot.context = slot.browser, None, None
+        if browser is not None:
+            try:
+                await browser.close()
+            except Exception:
+                logger.debug("Ignoring error while closing snapshot browser", exc_info=True)
+
+    async def _acquire(self) -> _BrowserSlot:
+        slot = await self._slots.get()
+        try:
+            if slot.browser is None or not slot.browser.is_connected():
+                await self._discard(slot)
+                await self._launch(slot)
+        except BaseException:
+            self._slots.put_nowait(slot)
+            raise
+        return slot
+
+    async def _release(self, slot: _BrowserSlot):
+        if slot.broken or slot.renders >= self.recycle_after:
+            await self._discard(slot)
+            slot.renders, slot.broken = 0, False
+            try:
+                await self._launch(slot)
+            except Exception:
+                logger.exception("Failed to relaunch snapshot browser")
+        self._slots.put_nowait(slot)
+
+    # ---------- request interception ----------
+    async def _route(self, route):
+        """
+        Serve sub-resources deterministically: allowed assets come from the LRU
+        byte cache or a fetch bounded by ``resource_timeout``; trackers, scripts
+        and hosts that recently timed out are stubbed or blocked outright.
+        """
+        request = route.request
+        url = request.url
+        if not url.startswith(("http://", "https://")):
+            await route.continue_()
+            return
+        host = urlsplit(url).hostname or ""
+        now = self._loop.time()
+        is_image = request.resource_type == "image"
+
+        if request.resource_type not in ALLOWED_RESOURCE_TYPES:
+            await route.abort("blockedbyclient")
+            return
+        if _host_matches(host, self.blocked_hosts) or self._slow_hosts.get(host, 0) > now:
+            if is_image:
+                await route.fulfill(status=200, content_type="image/gif", body=_BLANK_GIF)
+            else:
+                await route.abort("blockedbyclient")
+            return
+
+        cached = self._assets.get(url)
+        if cached is not None:
+            content_type, body = cached
+            await route.fulfill(status=200, content_type=content_type, body=body)
+            return
+
+        try:
+            response = await route.fetch(timeout=self.resource_timeout * 1000, max_redirects=3)
+            body = await response.body()
+        except Exception:
+            # Too slow or unreachable: stub it now and skip the host for a while.
+            self._slow_hosts[host] = now + self.slow_host_cooldown
+            if is_image:
+                await route.fulfill(status=200, content_type="image/gif", body=_BLANK_GIF)
+            else:
+                await route.abort("timedout")
+            return
+        content_type = response.headers.get("content-type", "application/octet-stream")
+        if response.ok:
+            self._assets.put(url, content_type, body)
+        await route.fulfill(status=response.status, content_type=content_type, body=body)
+
+    # ---------- rendering ----------
+    async def _render(self, full_html: str, width: int, height: int) -> bytes:
+        slot = await self._acquire()
+        try:
+            page = await slot.context.new_page()
+            try:
+                await page.set_viewport_size({"width": width, "height": height})
+                await page.set_content(full_html, wait_until="domcontentloaded")
+                await self._wait_until_ready(page)
+                png_bytes = await page.screenshot(full_page=False, type="png")
+            finally:
+                await page.close()
+            slot.renders += 1
             return png_bytes
+        except BaseException:
+            # Crashes and timeouts (cancellation) both retire the browser.
+            slot.broken = True
+            raise
+        finally:
+            await asyncio.shield(self._release(slot))
+
+    async def _wait_until_ready(self, page):
+        """Wait for the load event and web fonts, bounded by ``ready_timeout`` instead of a fixed sleep."""
+        try:
+            await page.wait_for_load_state("load", timeout=self.ready_timeout * 1000)
+            await page.evaluate("document.fonts.ready.then(() => true)")
+        except Exception:
+            # Screenshot whatever has arrived; every sub-resource is already time-bounded.
+            logger.debug("Snapshot page not fully ready after %ss", self.ready_timeout)
+
+    def render(self, full_html: str, width: int = SNAPSHOT_WIDTH, height: int = SNAPSHOT_HEIGHT) -> bytes:
+        """Render a complete HTML document to PNG bytes, blocking the caller."""
+        if self._loop is None or self._pid != os.getpid():
+            self.start()
+        coro = asyncio.wait_for(self._render(full_html, width, height), timeout=self.render_timeout)
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        return future.result()
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def renderer_options() -> dict:
+    """Request-interception settings shared by every SnapshotRenderer instance."""
+    return {
+        "intercept": getattr(settings, "SNAPSHOT_INTERCEPT_REQUESTS", True),
+        "resource_timeout": getattr(settings, "SNAPSHOT_RESOURCE_TIMEOUT", 3.0),
+        "ready_timeout": getattr(settings, "SNAPSHOT_READY_TIMEOUT", 5.0),
+        "blocked_hosts": getattr(settings, "SNAPSHOT_BLOCKED_HOSTS", DEFAULT_BLOCKED_HOSTS),
+        "asset_cache_bytes": getattr(settings, "SNAPSHOT_ASSET_CACHE_BYTES", 64 * 1024 * 1024),
+    }
+
+
+def get_renderer() -> SnapshotRenderer:
+    """Process-wide renderer, created on first use (and again after a fork)."""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = SnapshotRenderer(
+                pool_size=getattr(settings, "SNAPSHOT_POOL_SIZE", 2),
+                recycle_after=getattr(settings, "SNAPSHOT_RECYCLE_AFTER", 200),
+                render_timeout=getattr(settings, "SNAPSHOT_RENDER_TIMEOUT", 15.0),
+                **renderer_options(),
+            )
+            atexit.register(_renderer.close)
+        return _renderer
+
+
+def render(html: str, width: int = SNAPSHOT_WIDTH, height: int = SNAPSHOT_HEIGHT, bg: str = SNAPSHOT_BG,
+           renderer: SnapshotRenderer | None = None) -> bytes:
+    """Render the given HTML fragment into PNG bytes using the shared (or given) browser pool."""
+    full_html = HTML_WRAPPER.format(inner_html=html or "<div></div>", bg=bg)
+    return (renderer or get_renderer()).render(full_html, width, height)
+
 
 def render_html_to_snapshot_content(html: str, width: int = SNAPSHOT_WIDTH, height: int = SNAPSHOT_HEIGHT, bg: str = SNAPSHOT_BG) -> ContentFile:
     """Render the given HTML into a PNG snapshot and return a Django ContentFile."""
-    full_html = HTML_WRAPPER.format(inner_html=html or "<div></div>", bg=bg)
-    png = asyncio.run(_render_with_playwright(full_html, width, height))
-    return ContentFile(png)
+    return ContentFile(render(html, width, height, bg))
@@ -0,0 +1,61 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+from emails.snapshot import SNAPSHOT_DERIVATIVES
+
+register = template.Library()
+
+
+def _variant_urls(obj) -> dict:
+    # TemplateCard rows carry resolved URLs; EmailTemplate rows carry storage names
+    urls = getattr(obj, "snapshot_variant_urls", None)
+    if urls is not None:
+        return urls
+    return {key: default_storage.url(name) for key, name in (getattr(obj, "snapshot_variants", None) or {}).items()}
+
+
+def _original_url(obj) -> str:
+    snapshot = obj.snapshot
+    if isinstance(snapshot, str):
+        return snapshot
+    return snapshot.url if snapshot else ""
+
+
+def _srcset(urls: dict, fmt: str) -> str:
+    return ", ".join(
+        f"{urls[f'{name}.{fmt}']} {width}w"
+        for name, (width, _height) in SNAPSHOT_DERIVATIVES.items()
+        if f"{name}.{fmt}" in urls
+    )
+
+
+@register.simple_tag
+def snapshot_url(obj, size="full", fmt="png"):
+    """URL of one derivative, falling back to the original snapshot."""
+    return _variant_urls(obj).get(f"{size}.{fmt}") or _original_url(obj)
+
+
+@register.simple_tag
+def snapshot_picture(obj, size="card", alt="", css_class="", style="", sizes=None):
+    """
+    <picture> with WebP + PNG srcsets over every derivative size, so the browser
+    downloads the smallest image that fits. Falls back to a plain <img> of the
+    original when no derivatives exist yet.
+    """
+    urls = _variant_urls(obj)
+    if not urls:
+        if not obj.snapshot:
+            return ""
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" style="{}" loading="lazy">',
+            _original_url(obj), alt, css_class, style,
+        )
+    width, height = SNAPSHOT_DERIVATIVES[size]
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" class="{}" style="{}" loading="lazy">'
+        "</picture>",
+        _srcset(urls, "webp"), sizes or f"{width}px",
+        snapshot_url(obj, size, "png"), _srcset(urls, "png"), sizes or f"{width}px",
+        width, height, alt, css_class, style,
+    )
@@ -0,0 +1,199 @@
+from unittest import mock, skipUnless
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from catalog.models import Offer, OfferLink, OfferNetwork, PersonalizedTag, Platform, TrackingParamSet
+
+from .admin import EmailTemplateAdmin
+from .analytics import COMMIT_LAG, rollup_new_events
+from .jobs import find_shared_snapshot
+from .models import EmailTemplate, SnapshotJob, TemplateCard, UsageDaily, UsageEvent, UsageHourly
+
+User = get_user_model()
+
+LOCMEM = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "emails-tests"},
+    "select2": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "emails-tests-select2"},
+}
+
+
+@override_settings(CACHES=LOCMEM, PERSONALIZATION_CACHE=True, TEMPLATE_USAGE_WRITE_BEHIND=True)
+class TemplateUseQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("sender", password="x")
+        cls.platform = Platform.objects.create(name="Mailer", created_by=cls.user)
+        PersonalizedTag.objects.create(user=cls.user, platform=cls.platform, first_name_tag="[FIRST]")
+        TrackingParamSet.objects.create(platform=cls.platform, params={"utm_source": "mailer"}, created_by=cls.user)
+        offer = Offer.objects.create(network=OfferNetwork.objects.create(name="Net"), name="Spring sale")
+        cls.link = OfferLink.objects.create(offer=offer, url="https://offers.example/spring", created_by=cls.user)
+        cls.template = EmailTemplate.objects.create(
+            owner=cls.user, title="Hello", is_public=True, body_html="<p>Hi {{first_name}}, <a href='{{cta}}'>go</a></p>"
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.url = reverse("emails:template_use", args=[self.template.pk])
+        self.data = {"platform": self.platform.pk, "offer_link": self.link.pk}
+
+    def test_warm_post_reads_the_catalog_once(self):
+        # Cold: builds the personalization context and stores the resolved CTA URL
+        self.client.post(self.url, self.data)
+        # session, user, template, offer link + stored CTA URL, and the navbar's profile;
+        # the usage write goes to the cache
+        with self.assertNumQueries(5):
+            response = self.client.post(self.url, self.data)
+        self.assertContains(response, "https://offers.example/spring?utm_source=mailer")
+
+
+class TemplatePreviewConditionalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user("author")
+        cls.template = EmailTemplate.objects.create(owner=owner, title="Card", is_public=True, body_html="<p>Hi</p>")
+
+    def setUp(self):
+        self.url = reverse("emails:template_preview", args=[self.template.pk])
+        self.first = self.client.get(self.url)
+
+    def assertNotModified(self, **headers):
+        # Only the TemplateCard version lookup runs: no EmailTemplate fetch, no rendering
+        with mock.patch("emails.views.render") as render, self.assertNumQueries(1):
+            response = self.client.get(self.url, headers=headers)
+        self.assertEqual(response.status_code, 304)
+        render.assert_not_called()
+
+    def test_etag_match_is_not_modified(self):
+        self.assertNotModified(if_none_match=self.first["ETag"])
+
+    def test_last_modified_is_not_modified(self):
+        self.assertNotModified(if_modified_since=self.first["Last-Modified"])
+
+
+@skipUnless(connection.vendor == "postgresql", "admin full-text search runs on PostgreSQL only")
+class AdminSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user("alice")
+        cls.newsletter = EmailTemplate.objects.create(
+            owner=cls.alice, title="Weekly newsletter", body_html="<p>x</p>", body_text="Spring discounts inside"
+        )
+        cls.numeric = EmailTemplate.objects.create(
+            owner=User.objects.create_user("bob"), title="Receipt", template_id="20251018", body_html="<p>x</p>"
+        )
+
+    def search(self, term):
+        model_admin = EmailTemplateAdmin(EmailTemplate, admin.site)
+        results, _ = model_admin.get_search_results(RequestFactory().get("/"), EmailTemplate.objects.all(), term)
+        return set(results)
+
+    def test_matches_search_vector(self):
+        self.assertEqual(self.search("discounts"), {self.newsletter})
+
+    def test_matches_owner_username(self):
+        self.assertEqual(self.search("alice"), {self.newsletter})
+
+    def test_all_digit_template_id_beats_pk(self):
+        self.assertEqual(self.search("2025"), {self.numeric})
+
+    def test_pk_when_no_template_id_matches(self):
+        pk = self.newsletter.pk
+        if EmailTemplate.objects.filter(template_id__contains=str(pk)).exists():
+            self.skipTest("a generated template_id contains the pk")
+        self.assertEqual(self.search(str(pk)), {self.newsletter})
+
+
+@override_settings(CACHES=LOCMEM, GALLERY_PAGE_CACHE_SECONDS=60)
+class GalleryPageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user("curator")
+        EmailTemplate.objects.create(owner=owner, title="Public", is_public=True, body_html="<p>p</p>")
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse("emails:home")
+
+    def test_unused_parameters_share_the_cached_page(self):
+        self.assertEqual(self.client.get(self.url)["X-Gallery-Cache"], "MISS")
+        response = self.client.get(self.url, {"utm_source": "newsletter", "fbclid": "abc"})
+        self.assertEqual(response["X-Gallery-Cache"], "HIT")
+        self.assertNotContains(response, "utm_source")
+
+    def test_page_parameters_get_their_own_entry(self):
+        self.client.get(self.url)
+        self.assertEqual(self.client.get(self.url, {"q": "public"})["X-Gallery-Cache"], "MISS")
+
+
+class AdminVisibilityActionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user("publisher")
+        cls.template = EmailTemplate.objects.create(owner=owner, title="Draft", body_html="<p>d</p>")
+
+    def run_action(self, action, queryset):
+        model_admin = EmailTemplateAdmin(EmailTemplate, admin.site)
+        getattr(model_admin, action)(RequestFactory().post("/"), queryset)
+        return TemplateCard.objects.get(pk=self.template.pk)
+
+    def test_make_public_on_changelist_filtered_by_is_public(self):
+        card = self.run_action("make_public", EmailTemplate.objects.filter(is_public=False))
+        self.assertTrue(card.is_public)
+
+    def test_make_private_on_changelist_filtered_by_is_public(self):
+        EmailTemplate.objects.filter(pk=self.template.pk).update(is_public=True)
+        TemplateCard.refresh([self.template.pk])
+        card = self.run_action("make_private", EmailTemplate.objects.filter(is_public=True))
+        self.assertFalse(card.is_public)
+
+
+class SnapshotQueueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user("designer")
+
+    def test_job_is_queued_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            template = EmailTemplate.objects.create(owner=self.owner, title="New", body_html="<p>New</p>")
+            self.assertFalse(SnapshotJob.objects.filter(template=template).exists())
+        self.assertTrue(SnapshotJob.objects.filter(template=template).exists())
+
+    def test_uploaded_snapshot_is_not_shared(self):
+        template = EmailTemplate.objects.create(owner=self.owner, title="Custom", body_html="<p>Same</p>")
+        EmailTemplate.objects.filter(pk=template.pk).update(
+            snapshot="snapshots/custom.png", snapshot_digest=template.body_digest, snapshot_uploaded=True
+        )
+        self.assertIsNone(find_shared_snapshot(template.body_digest))
+        EmailTemplate.objects.filter(pk=template.pk).update(snapshot_uploaded=False)
+        self.assertEqual(find_shared_snapshot(template.body_digest)[0], "snapshots/custom.png")
+
+
+class RollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("roller")
+        cls.template = EmailTemplate.objects.create(owner=cls.user, title="Rolled", body_html="<p>r</p>")
+        cls.platform = Platform.objects.create(name="Mailer", created_by=cls.user)
+
+    def add_events(self, *platforms):
+        at = timezone.now().replace(minute=5)
+        for platform in platforms:
+            UsageEvent.objects.create(template=self.template, user=self.user, platform=platform, occurred_at=at)
+        # Past the commit lag, so the rollup takes them
+        UsageEvent.objects.update(recorded_at=timezone.now() - 2 * COMMIT_LAG)
+
+    def test_runs_fold_into_one_row_per_key(self):
+        self.add_events(None, None, self.platform)
+        rollup_new_events()
+        self.add_events(None, self.platform)
+        self.assertEqual(rollup_new_events(), 2)
+        for model in (UsageHourly, UsageDaily):
+            rows = dict(model.objects.values_list("platform_id", "uses"))
+            self.assertEqual(rows, {None: 3, self.platform.pk: 2})
@@ -11,9 +11,11 @@ urlpatterns = [
     path("", views.home, name="home"),
     path("mine/", views.my_templates, name="my_templates"),
     path("create/", views.template_create, name="template_create"),
+    path("leaderboard.json", views.template_leaderboard, name="template_leaderboard"),
     path('offerlink-autocomplete/', OfferLinkAutocomplete.as_view(), name='offerlink-autocomplete'),
     path("<int:pk>/edit/", views.template_edit, name="template_edit"),
     path("<int:pk>/use/", views.template_use, name="template_use"),
+    path("<int:pk>/use/bulk/", views.template_use_bulk, name="template_use_bulk"),
     path("<int:pk>/delete/", views.template_delete, name="template_delete"),
     path("<int:pk>/preview/", views.template_preview, name="template_preview"),
 ] 
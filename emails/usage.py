@@ -0,0 +1,265 @@
+# Write-behind TemplateUsage counters and usage events.
+#
+# record_use() buffers in the shared cache; flush_usage() (run by the
+# `flush_template_usage` command) writes everything out in bulk.
+#
+#   usage:pending:<user>:<template>  atomic counter of unflushed uses
+#   usage:pairs:*                    log of pairs whose counter went 0 -> n
+#   usage:events:*                   log of UsageEvent rows not yet inserted
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .models import EmailTemplate, TemplateCard, TemplateUsage, UsageEvent
+
+
+def _pending_key(user_id, template_id):
+    return f"usage:pending:{user_id}:{template_id}"
+
+
+def write_behind_enabled():
+    # A per-process LocMem cache is invisible to the flusher, so buffering needs a shared cache.
+    return getattr(settings, "TEMPLATE_USAGE_WRITE_BEHIND", False)
+
+
+def _incr(key, delta=1):
+    """Atomic incr that creates a non-expiring key on first use. Returns the new value."""
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        if cache.add(key, delta, None):
+            return delta
+        return cache.incr(key, delta)
+
+
+class _SlotLog:
+    """
+    Append-only log kept in the cache: an atomic sequence number plus one key per entry.
+    Readers remember how far they got, so every entry is handed out once.
+    """
+
+    def __init__(self, name):
+        self.seq_key = f"usage:{name}:seq"
+        self.flushed_key = f"usage:{name}:flushed"
+        self.last_head_key = f"usage:{name}:last_head"
+        self.prefix = f"usage:{name}:slot:"
+
+    def append(self, value):
+        n = _incr(self.seq_key)
+        cache.set(f"{self.prefix}{n}", value, None)
+
+    def batches(self, batch_size):
+        """
+        Yield lists of entries. Resuming the generator acknowledges the previous batch;
+        if the caller raises instead, those entries are handed out again next time.
+        """
+        head = cache.get(self.seq_key, 0)
+        start = cache.get(self.flushed_key, 0)
+        last_head = cache.get(self.last_head_key, 0)
+        while start < head:
+            end = min(head, start + batch_size)
+            keys = [f"{self.prefix}{n}" for n in range(start + 1, end + 1)]
+            slots = cache.get_many(keys)
+            consumed, entries = start, []
+            for n, key in enumerate(keys, start=start + 1):
+                if key not in slots:
+                    # Sequence taken but slot not written yet; give the writer until the next run,
+                    # after that treat it as abandoned (the writer died between the two calls)
+                    if n > last_head:
+                        break
+                else:
+                    entries.append(slots[key])
+                consumed = n
+            yield entries
+            cache.delete_many(keys[:consumed - start])
+            cache.set(self.flushed_key, consumed, None)
+            if consumed < end:
+                break
+            start = consumed
+        cache.set(self.last_head_key, head, None)
+
+
+_pairs = _SlotLog("pairs")
+_events = _SlotLog("events")
+
+
+def record_use(user_id, template_id, count=1, platform_id=None, offer_link_id=None):
+    event = (user_id, template_id, platform_id, offer_link_id, timezone.now(), count)
+    if not write_behind_enabled():
+        upsert_counts({(user_id, template_id): count}, check_templates=False)
+        insert_events([event], check_templates=False)
+        _remember_used(user_id, template_id)
+        return
+    if _incr(_pending_key(user_id, template_id), count) == count:
+        # Counter was empty: register the pair so the flusher finds it
+        _pairs.append((user_id, template_id))
+    _events.append(event)
+    _remember_used(user_id, template_id)
+
+
+def upsert_counts(deltas, check_templates=True):
+    """Add {(user_id, template_id): delta} onto TemplateUsage in one INSERT .. ON CONFLICT statement."""
+    if not deltas:
+        return 0
+    rows = [(t, u, n) for (u, t), n in deltas.items() if n > 0]
+    if check_templates:
+        # Buffered uses can outlive their template; drop those instead of failing the FK
+        live = set(EmailTemplate.objects.filter(pk__in={t for t, _, _ in rows}).values_list("pk", flat=True))
+        rows = [r for r in rows if r[0] in live]
+    if not rows:
+        return 0
+
+    qn = connection.ops.quote_name
+    table = qn(TemplateUsage._meta.db_table)
+    now = timezone.now()
+    values = ", ".join(["(%s, %s, %s, %s)"] * len(rows))
+    params = []
+    for template_id, user_id, n in rows:
+        params.extend([template_id, user_id, n, now])
+    sql = (
+        f"INSERT INTO {table} ({qn('template_id')}, {qn('user_id')}, {qn('used_count')}, {qn('last_used_at')}) "
+        f"VALUES {values} "
+        f"ON CONFLICT ({qn('template_id')}, {qn('user_id')}) DO UPDATE SET "
+        f"{qn('used_count')} = {table}.{qn('used_count')} + EXCLUDED.{qn('used_count')}, "
+        f"{qn('last_used_at')} = EXCLUDED.{qn('last_used_at')}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+    # Keep the card read model's running total in step
+    per_template = {}
+    for template_id, _, n in rows:
+        per_template[template_id] = per_template.get(template_id, 0) + n
+    TemplateCard.objects.filter(pk__in=per_template).update(
+        uses_total=F("uses_total") + Case(*[When(pk=t, then=Value(n)) for t, n in per_template.items()], default=0)
+    )
+    return len(rows)
+
+
+def insert_events(events, check_templates=True):
+    """bulk_create UsageEvent rows from (user_id, template_id, platform_id, offer_link_id, occurred_at, count)."""
+    if check_templates:
+        live = set(EmailTemplate.objects.filter(pk__in={e[1] for e in events}).values_list("pk", flat=True))
+        events = [e for e in events if e[1] in live]
+    UsageEvent.objects.bulk_create(
+        [
+            UsageEvent(user_id=u, template_id=t, platform_id=p, offer_link_id=o, occurred_at=at, count=n)
+            for u, t, p, o, at, n in events
+        ],
+        batch_size=1000,
+    )
+    return len(events)
+
+
+def flush_usage(batch_size=1000):
+    """
+    Move buffered counters and events into the database. Returns (pairs_written, uses_written, events_written).
+
+    Counters are decremented by exactly what was written; a pair whose counter is still
+    above zero afterwards is logged again, so uses recorded during the flush are written
+    by the next one. A crash between the DB commit and the
+    cache acknowledgement re-applies that batch (at-least-once), it never drops it.
+    """
+    pairs_written = uses_written = events_written = 0
+
+    for entries in _pairs.batches(batch_size):
+        pairs = set(entries)
+        pending = cache.get_many([_pending_key(u, t) for u, t in pairs])
+        deltas = {
+            (u, t): pending[_pending_key(u, t)]
+            for u, t in pairs
+            if pending.get(_pending_key(u, t), 0) > 0
+        }
+        with transaction.atomic():
+            upsert_counts(deltas)
+        for (u, t), n in deltas.items():
+            try:
+                left = cache.decr(_pending_key(u, t), n)
+            except ValueError:
+                continue  # evicted meanwhile; nothing left to subtract from
+            if left > 0:
+                # Used again since get_many: record_use saw a non-zero counter and did not log
+                # the pair, so log it here or the remainder would never be flushed
+                _pairs.append((u, t))
+        # An array rebuilt from the DB before this flush could lack these pairs; rebuild on next read
+        cache.delete_many([_used_key(u) for u in {u for u, _ in deltas}])
+        pairs_written += len(deltas)
+        uses_written += sum(deltas.values())
+
+    for entries in _events.batches(batch_size):
+        if entries:
+            with transaction.atomic():
+                events_written += insert_events(entries)
+
+    return pairs_written, uses_written, events_written
+
+
+def pending_counts(user_id, template_ids):
+    """Buffered (not yet flushed) uses per template for this user."""
+    if not write_behind_enabled():
+        return {}
+    template_ids = list(template_ids)
+    values = cache.get_many([_pending_key(user_id, t) for t in template_ids])
+    return {t: values[_pending_key(user_id, t)] for t in template_ids if values.get(_pending_key(user_id, t))}
+
+
+# ---------- per-user "used templates" set ----------
+USED_TTL = 60 * 60 * 24
+
+
+def _used_key(user_id):
+    return f"usage:used:{user_id}"
+
+
+def used_ids(user_id):
+    """Sorted array('q') of template ids this user has used (flushed uses), cached as raw bytes."""
+    data = cache.get(_used_key(user_id))
+    arr = array("q")
+    if data is not None:
+        arr.frombytes(data)
+        return arr
+    arr.extend(
+        TemplateUsage.objects.filter(user_id=user_id).order_by("template_id").values_list("template_id", flat=True)
+    )
+    cache.set(_used_key(user_id), arr.tobytes(), USED_TTL)
+    return arr
+
+
+def _contains(arr, value):
+    i = bisect_left(arr, value)
+    return i < len(arr) and arr[i] == value
+
+
+def _remember_used(user_id, template_id):
+    key, lock = _used_key(user_id), f"{_used_key(user_id)}:lock"
+    if not cache.add(lock, 1, 5):
+        # Someone else is rewriting this user's array; drop it rather than race, it rebuilds on read
+        cache.delete(key)
+        return
+    try:
+        data = cache.get(key)
+        if data is None:
+            return  # built lazily on the next read
+        arr = array("q")
+        arr.frombytes(data)
+        i = bisect_left(arr, template_id)
+        if i == len(arr) or arr[i] != template_id:
+            arr.insert(i, template_id)
+            cache.set(key, arr.tobytes(), USED_TTL)
+    finally:
+        cache.delete(lock)
+
+
+def mark_used(cards, user_id):
+    """Set `is_used` on each card: a binary search in the cached array plus buffered uses, no DB on a warm cache."""
+    cards = list(cards)
+    arr = used_ids(user_id)
+    pending = pending_counts(user_id, [c.pk for c in cards])
+    for card in cards:
+        card.is_used = card.pk in pending or _contains(arr, card.pk)
+    return cards
@@ -1,5 +1,7 @@
 
 import re
+import threading
+from collections import OrderedDict
 from urllib.parse import urlencode, urlparse, parse_qsl, urlunparse,  quote
 
 
@@ -14,6 +16,65 @@ def fill_placeholders(text, mapping):
         return str(mapping.get(key, m.group(0)))
     return PLACEHOLDER_PATTERN.sub(repl, text or "")
 
+class CompiledTemplate:
+    """
+    A body split once into literal and placeholder segments.
+    Filling is a single join over the segment list instead of a regex pass.
+    """
+    __slots__ = ("parts", "slots", "placeholders")
+
+    def __init__(self, text):
+        text = text or ""
+        parts, slots, pos = [], [], 0
+        for m in PLACEHOLDER_PATTERN.finditer(text):
+            parts.append(text[pos:m.start()])
+            # (index into parts, key, original token kept when the key is unmapped)
+            slots.append((len(parts), m.group(1).strip(), m.group(0)))
+            parts.append(m.group(0))
+            pos = m.end()
+        parts.append(text[pos:])
+        self.parts = parts
+        self.slots = tuple(slots)
+        self.placeholders = sorted({key for _, key, _ in slots})
+
+    def fill(self, mapping):
+        parts = self.parts.copy()
+        for index, key, raw in self.slots:
+            parts[index] = str(mapping.get(key, raw))
+        return "".join(parts)
+
+
+COMPILED_CACHE_SIZE = 128
+_compiled_cache = OrderedDict()
+_compiled_lock = threading.Lock()
+
+def compiled_body(template, field="body_html"):
+    """CompiledTemplate for one body field, cached per (pk, updated_at) in a bounded LRU."""
+    key = (template.pk, template.updated_at, field)
+    with _compiled_lock:
+        compiled = _compiled_cache.get(key)
+        if compiled is not None:
+            _compiled_cache.move_to_end(key)
+            return compiled
+    compiled = CompiledTemplate(getattr(template, field))
+    with _compiled_lock:
+        _compiled_cache[key] = compiled
+        while len(_compiled_cache) > COMPILED_CACHE_SIZE:
+            _compiled_cache.popitem(last=False)
+    return compiled
+
+def build_tag_map(tags, cta_url):
+    """Placeholder values from a PersonalizedTag set (or None); unknown values keep their {{TOKEN}}."""
+    return {
+        "FIRST_NAME": tags.first_name_tag if tags else "{{FIRST_NAME}}",
+        "LAST_NAME": tags.last_name_tag if tags else "{{LAST_NAME}}",
+        "EMAIL": tags.email_tag if tags else "{{EMAIL}}",
+        "DATE": tags.date_tag if tags else "{{DATE}}",
+        "FOOTER1": tags.footer1_code if tags else "{{FOOTER1}}",
+        "FOOTER2": tags.footer2_code if tags else "{{FOOTER2}}",
+        "CTA_URL": cta_url or "{{CTA_URL}}",
+    }
+
 def append_query_params(url, params: dict):
     if not url:
         return ""
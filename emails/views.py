@@ -2,53 +2,93 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q
-from .models import EmailTemplate, TemplateUsage
-from django.utils import timezone
-from .forms import EmailTemplateForm, UseTemplateForm
-from .utils import detect_placeholders, fill_placeholders, append_query_params
-from catalog.models import PersonalizedTag, Platform, TrackingParamSet, OfferLink
+from django.db.models import Exists, OuterRef
+from .models import EmailTemplate, TemplateCard, TemplatePlaceholder, SnapshotJob
+from .forms import EmailTemplateForm, UseTemplateForm, BulkUseTemplateForm
+from .analytics import LEADERBOARD_PERIODS, leaderboard
+from .page_cache import PAGE_PARAMS, anonymous_page_cache
+from .pagination import keyset_page
+from .search import search_cards
+from .usage import mark_used, record_use
+from .merge import iter_recipient_rows, merge_rows, should_use_pool, stream_jsonl, stream_zip
+from .utils import compiled_body, append_query_params, build_tag_map
+from catalog.cta import resolve_cta
+from catalog.personalization import get_context as get_personalization
+from catalog.search import get_offer_index
 from django import forms
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_headers
+from django.http import HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.core.cache import cache
 from django.core.paginator import Paginator
+from django.conf import settings
 from django_select2.views import AutoResponseView
 
+def _with_snapshot_state(templates):
+    """Annotate `snapshot_pending` so cards can show a placeholder until the worker lands the image."""
+    pending = SnapshotJob.objects.filter(
+        template=OuterRef("pk"),
+        status__in=[SnapshotJob.STATUS_PENDING, SnapshotJob.STATUS_RUNNING],
+    )
+    return templates.annotate(snapshot_pending=Exists(pending))
+
+def _using_placeholder(name):
+    return TemplatePlaceholder.objects.filter(name=name).values("template_id")
+
+def _paginate(request, templates, per_page, ranked):
+    """
+    Ranked search results and explicit ?page= links keep the numbered Paginator;
+    plain listings use keyset pagination on (updated_at, id) with ?cursor= tokens.
+    """
+    if ranked or request.GET.get("page"):
+        return Paginator(templates, per_page).get_page(request.GET.get("page"))
+    return keyset_page(
+        templates, per_page, request.GET.get("cursor"),
+        estimate=getattr(settings, "TEMPLATE_LIST_ESTIMATES", True),
+    )
+
+def _page_query(request, keep=None):
+    """Current filters (only those in `keep`, if given) as a query string, minus the paging parameters."""
+    params = request.GET.copy()
+    params.pop("page", None)
+    params.pop("cursor", None)
+    if keep is not None:
+        for name in set(params) - set(keep):
+            del params[name]
+    return params.urlencode()
+
+@anonymous_page_cache
 def home(request):
     q = request.GET.get("q", "")
-    templates = EmailTemplate.objects.filter(is_public=True)
-
-    if q:
-        templates = templates.filter(
-            Q(title__icontains=q) |
-            Q(subject__icontains=q) |
-            Q(from_name__icontains=q) |
-            Q(template_id__icontains=q)   # ✅ allow search by template id
-        )
+    uses = request.GET.get("uses", "").strip()
+    # Cards are the slim read model; bodies are only loaded on edit/use/preview
+    templates = TemplateCard.objects.filter(is_public=True)
+    if uses:
+        templates = templates.filter(pk__in=_using_placeholder(uses))
 
-    templates = templates.select_related("owner").order_by("-updated_at")
+    # ✅ ranked full-text search on PostgreSQL (title, subject, from name, body; partial template id)
+    templates, ranked = search_cards(templates, q)
+    if not ranked:
+        templates = templates.order_by("-updated_at", "-pk")
 
-    # ✅ Pagination added (show 12 per page, no change in logic)
-    paginator = Paginator(templates, 9)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    templates = _with_snapshot_state(templates)
 
-    # Get all template IDs the current user has used
-    if request.user.is_authenticated:
-        used_template_ids = TemplateUsage.objects.filter(
-            user=request.user,
-            template__in=page_obj  # ✅ paginate-aware query
-        ).values_list('template_id', flat=True)
-    else:
-        used_template_ids = []  # empty list for anonymous users
+    page_obj = _paginate(request, templates, 9, ranked)
 
+    # Precompute the "Used" ribbon per card from the user's cached used-template array
+    if request.user.is_authenticated:
+        page_obj.object_list = mark_used(page_obj.object_list, request.user.pk)
     return render(
         request,
         "emails/home.html",
         {
             "templates": page_obj,              # ✅ paginated queryset
             "q": q,
-            "used_template_ids": used_template_ids,
+            "uses": uses,
             "page_obj": page_obj,               # ✅ added for pagination UI
+            # Cached pages are shared across ignored parameters, so their links must not carry them
+            "page_query": _page_query(request, keep=PAGE_PARAMS),
         },
     )
 
@@ -56,26 +96,21 @@ def home(request):
 def my_templates(request):
     q = request.GET.get("q", "")
     status = request.GET.get("status", "").lower()
-    templates = EmailTemplate.objects.filter(owner=request.user).order_by("-updated_at")
-    if q:
-        templates = templates.filter(
-        Q(title__icontains=q) |
-        Q(subject__icontains=q) |
-        Q(from_name__icontains=q) |
-        Q(template_id__icontains=q)   # ✅ allow search by template id
-    )
+    uses = request.GET.get("uses", "").strip()
+    templates = TemplateCard.objects.filter(owner=request.user).order_by("-updated_at", "-pk")
+    if uses:
+        templates = templates.filter(pk__in=_using_placeholder(uses))
+    templates, ranked = search_cards(templates, q)
     if status:
         if status == "active":
             templates = templates.filter(is_public=True)
         elif status == "inactive":
             templates = templates.filter(is_public=False)
-    # ✅ Pagination added (10 per pag)
-    paginator = Paginator(templates, 5)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    templates = _with_snapshot_state(templates)
+    page_obj = _paginate(request, templates, 5, ranked)
 
     return render(request, "emails/my_templates.html", {"templates": page_obj, "page_obj": page_obj, "q": q,
-        "status": status})
+        "status": status, "uses": uses, "page_query": _page_query(request)})
 
 @login_required
 def template_create(request):
@@ -116,43 +151,65 @@ def template_delete(request, pk):
 def normalize_tag_name(tag_name: str) -> str:
     return tag_name.strip().replace("-", "_").replace(" ", "_").lower()
 
-def record_template_usage(user, template):
-    """
-    Increment usage count for a user-template combination.
-    """
-    usage, created = TemplateUsage.objects.get_or_create(
-        user=user,
-        template=template,
-        defaults={"used_count": 1, "last_used_at": timezone.now()}
-    )
-
-    if not created:
-        # Only increment if record already exists
-        usage.used_count += 1
-        usage.last_used_at = timezone.now()
-        usage.save(update_fields=["used_count", "last_used_at"])
+def template_leaderboard(request):
+    """Most used public templates for ?period=day|week|month, optionally per ?network= / ?platform=."""
+    period = request.GET.get("period", "week")
+    if period not in LEADERBOARD_PERIODS:
+        return HttpResponseBadRequest("period must be one of: " + ", ".join(LEADERBOARD_PERIODS))
+    try:
+        network_id = int(request.GET["network"]) if request.GET.get("network") else None
+        platform_id = int(request.GET["platform"]) if request.GET.get("platform") else None
+        limit = min(max(int(request.GET.get("limit", 10)), 1), 50)
+    except ValueError:
+        return HttpResponseBadRequest("network, platform and limit must be integers")
+    return JsonResponse({
+        "period": period,
+        "results": leaderboard(period, network_id=network_id, platform_id=platform_id, limit=limit),
+    })
 
 class OfferLinkAutocomplete(AutoResponseView):
-    def get_queryset(self):
-        qs = OfferLink.objects.filter(is_active=True)
-        term = self.request.GET.get("term", "")
-        if term:
-            # Search in the related Offer's name
-            qs = qs.filter(offer__name__icontains=term)
-        return qs
+    """Answers select2 from this process's in-memory offer index instead of a LIKE join per keystroke."""
+
+    def get(self, request, *args, **kwargs):
+        self.widget = self.get_widget_or_404()
+        try:
+            page = max(int(request.GET.get("page") or 1), 1)
+        except ValueError:
+            page = 1
+        per_page = self.widget.max_results
+        hits, more = get_offer_index().search(
+            request.GET.get("term", ""), offset=(page - 1) * per_page, limit=per_page
+        )
+        return JsonResponse({"results": [{"id": pk, "text": label} for pk, label in hits], "more": more})
+
+def _personalize(ctx, platform, offer_link, cta_fallback_url):
+    """Resolve merge tags and the tracked CTA URL from the cached context. Returns (tag_map, cta_url, tracking)."""
+    platform_id = platform.pk if platform else None
+    tags = ctx.tags.get(platform_id)
+    tracking = ctx.tracking.get(platform_id)
+
+    # Build CTA URL: offer links read the materialized URL, a free-form fallback is tracked on the fly
+    if offer_link and tracking:
+        cta_url = resolve_cta(offer_link, tracking)
+    else:
+        cta_url = offer_link.url if offer_link else cta_fallback_url or ""
+        if tracking and cta_url:
+            cta_url = append_query_params(cta_url, tracking.params)
+
+    return build_tag_map(tags, cta_url), cta_url, tracking
 
 @login_required
 def template_use(request, pk):
     tpl = get_object_or_404(EmailTemplate, pk=pk)
-    detected_placeholders = detect_placeholders(tpl.body_html) + detect_placeholders(tpl.body_text)
-    detected_placeholders = sorted(set(detected_placeholders))
+    detected_placeholders = tpl.placeholders
   
     
     if not tpl.is_public and tpl.owner != request.user and not request.user.is_staff:
         messages.error(request, "You don't have access to use this template.")
         return redirect("emails:home")
 
-    form = UseTemplateForm(user=request.user, data=request.POST or None)
+    ctx = get_personalization(request.user)
+    form = UseTemplateForm(user=request.user, personalization=ctx, data=request.POST or None)
 
 
     if request.method == "POST" and form.is_valid():
@@ -163,35 +220,14 @@ def template_use(request, pk):
         cta_fallback_url = cleaned.pop("cta_fallback_url", "")
 
 
-        try:
-            tags = PersonalizedTag.objects.get(user=request.user, platform=platform, is_active=True)
-        except PersonalizedTag.DoesNotExist:
-            tags = None
-
-
-        # Build CTA URL
-
-        cta_url = offer_link.url if offer_link else cta_fallback_url or ""
-        tracking = TrackingParamSet.objects.filter(platform=platform, is_active=True).first()
-        if tracking and cta_url:
-            cta_url = append_query_params(cta_url, tracking.params)
-
+        tag_map, cta_url, tracking = _personalize(ctx, platform, offer_link, cta_fallback_url)
+        record_use(
+            request.user.pk, tpl.pk,
+            platform_id=platform.pk if platform else None, offer_link_id=offer_link.pk if offer_link else None,
+        )
 
-        # Map template placeholders
-        tag_map = {
-            "FIRST_NAME": tags.first_name_tag if tags else "{{FIRST_NAME}}",
-            "LAST_NAME": tags.last_name_tag if tags else "{{LAST_NAME}}",
-            "EMAIL": tags.email_tag if tags else "{{EMAIL}}",
-            "DATE": tags.date_tag if tags else "{{DATE}}",
-            "FOOTER1": tags.footer1_code if tags else "{{FOOTER1}}",
-            "FOOTER2": tags.footer2_code if tags else "{{FOOTER2}}",
-            "CTA_URL": cta_url or "{{CTA_URL}}",
-        }
-
-        filled_html = fill_placeholders(tpl.body_html, tag_map)
-        filled_text = fill_placeholders(tpl.body_text, tag_map)
-        usage, created = TemplateUsage.objects.get_or_create(user=request.user, template=tpl)
-        usage.increment_usage()
+        filled_html = compiled_body(tpl, "body_html").fill(tag_map)
+        filled_text = compiled_body(tpl, "body_text").fill(tag_map)
         return render(request, "emails/use_result.html", {
             "template": tpl,
             "filled_html": filled_html,
@@ -209,10 +245,66 @@ def template_use(request, pk):
     })
 
 
+@login_required
+def template_use_bulk(request, pk):
+    """Mail-merge one template over every row of an uploaded CSV/XLSX, streamed back as JSONL or ZIP."""
+    tpl = get_object_or_404(EmailTemplate, pk=pk)
+    if not tpl.is_public and tpl.owner != request.user and not request.user.is_staff:
+        messages.error(request, "You don't have access to use this template.")
+        return redirect("emails:home")
+
+    ctx = get_personalization(request.user)
+    form = BulkUseTemplateForm(
+        user=request.user, personalization=ctx, data=request.POST or None, files=request.FILES or None
+    )
+    if request.method == "POST" and form.is_valid():
+        cleaned = form.cleaned_data
+        upload = cleaned["recipients"]
+        # CTA + tracking resolution happens once for the whole file, not per row
+        platform, offer_link = cleaned.get("platform"), cleaned.get("offer_link")
+        tag_map, cta_url, tracking = _personalize(ctx, platform, offer_link, cleaned.get("cta_fallback_url", ""))
+        record_use(
+            request.user.pk, tpl.pk,
+            platform_id=platform.pk if platform else None, offer_link_id=offer_link.pk if offer_link else None,
+        )
+
+        results = merge_rows(tpl, tag_map, iter_recipient_rows(upload), use_pool=should_use_pool(upload))
+        if cleaned["output_format"] == "zip":
+            response = StreamingHttpResponse(stream_zip(results), content_type="application/zip")
+            filename = f"{tpl.template_id}-merge.zip"
+        else:
+            response = StreamingHttpResponse(stream_jsonl(results), content_type="application/x-ndjson")
+            filename = f"{tpl.template_id}-merge.jsonl"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    return render(request, "emails/use_bulk_form.html", {
+        "template": tpl,
+        "form": form,
+        "detected": tpl.placeholders,
+    })
+
+
+def _preview_version(request, pk):
+    # One slim lookup shared by the ETag and Last-Modified callbacks
+    if not hasattr(request, "_preview_version"):
+        request._preview_version = (
+            TemplateCard.objects.filter(pk=pk, is_public=True).values_list("updated_at", flat=True).first()
+        )
+    return request._preview_version
+
+def _preview_etag(request, pk):
+    updated_at = _preview_version(request, pk)
+    return f'"tpl-{pk}-{int(updated_at.timestamp() * 1_000_000)}"' if updated_at else None
+
+@cache_control(public=True, max_age=60)
+@vary_on_headers("Accept-Encoding")
+@condition(etag_func=_preview_etag, last_modified_func=_preview_version)
 def template_preview(request, pk):
     """
     Returns a safe HTML fragment for the preview modal.
     Shows subject + HTML body as stored (not processed as a Django template).
+    Conditional GETs are answered with 304 from the card's updated_at, without loading the body.
     """
     tpl = get_object_or_404(EmailTemplate, pk=pk, is_public=True)
     return render(request, "emails/preview_fragment.html", {"template": tpl})